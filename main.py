@@ -1,31 +1,34 @@
+import time
+STARTUP_TIME = time.perf_counter()
 import os
 import customtkinter as ctk
 from tkinter import ttk, filedialog, StringVar
 from dotenv import load_dotenv
 from PIL import Image
 from utils.gui_functions import *
+from utils.synthesis import LONG_FORM_CHAR_LIMIT, MAX_REQUEST_CHARS
+from utils.voice_catalog import VoiceCatalog
+from utils.audio_prep import WHISPER_API_WORKERS, prepare_for_upload
+from utils.history_store import HistoryStore, history_audio_path, prefetch_history_audio
+from utils.history_export import export_to_directory, export_to_zip
+from utils.playback import PlaybackEngine
+from utils.tick_scheduler import TickScheduler
+from utils.dispatcher import MainThreadDispatcher
+from utils.quota import QuotaTracker
+from utils.text_model import TextModel
+from utils.recorder import StreamingRecorder
+from utils.transcription_jobs import TranscriptionJob, TranscriptionQueue
+from utils.vad import VoiceActivitySegmenter
+from utils.whisper_models import WHISPER_MODEL_SIZES, WHISPER_PRELOAD, WhisperModelManager
+from utils.lazy_import import is_available, lazy_import
 from threading import Thread
-import sys
-import numpy as np
-import sounddevice as sd
-import soundfile as sf
-import time
+from concurrent.futures import ThreadPoolExecutor
 import re
+import itertools
 import logging
-import sys
-try:
-    import openai
-    # Whisper API is available
-except ImportError:
-    openai = None
-    # Handle Whisper API not being available
-
-try:
-    import whisper
-    # Whisper Local is available
-except ImportError:
-    whisper = None
-    # Handle Whisper Local not being available
+
+# Heavy libraries are imported on first use; whisper pulls in torch
+sf = lazy_import('soundfile')
 
 
 # Modes: "System" (standard), "Dark", "Light"
@@ -37,12 +40,33 @@ ctk.set_default_color_theme("blue")
 load_dotenv()
 ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+PREVIEW_PREFETCH_DELAY_MS = 2000
+# A failed voice fetch is retried after this long, doubling up to the maximum
+VOICE_RETRY_MS = 5000
+VOICE_RETRY_MAX_MS = 60000
+# History rows are inserted in batches, a screenful or two ahead of the view
+HISTORY_BATCH_SIZE = 20
+HISTORY_LOOKAHEAD_ROWS = 40
+HISTORY_PREFETCH_FRACTION = 0.8
+# Rows above and below the selection whose audio is downloaded ahead of a click
+HISTORY_AUDIO_PREFETCH_ROWS = 1
+# Search runs once typing pauses for this long
+HISTORY_SEARCH_DELAY_MS = 250
+# How long a finished transcription stays in the job list
+JOB_ROW_LINGER_MS = 3000
 
 
 class ElevenGUI:
 
     def __init__(self):
         self.root = ctk.CTk()
+        # Drives every periodic widget update, and nothing while nothing moves
+        self.ticks = TickScheduler(self.root)
+        # Worker threads hand their widget updates to the Tk thread through this
+        self.dispatcher = MainThreadDispatcher(self.root)
+        # Counted locally per generation, shown on the Tk thread
+        self.quota = QuotaTracker(ELEVENLABS_API_KEY, on_change=lambda used, limit: self.dispatcher.post(
+            show_quota, self.right_button, (used, limit)))
         self.root.title("ElevenGUI")
         self.window_width = 1400
         self.window_height = 800
@@ -59,15 +83,19 @@ class ElevenGUI:
         # self.root.geometry("1400x800")
         self.image_path = os.path.join(os.path.dirname(
             os.path.realpath(__file__)), "images")
-        self.voices_data = fetch_voices(ELEVENLABS_API_KEY)
+        # Voices come from the on-disk snapshot; the network is only used in the background
+        self.voice_catalog = VoiceCatalog(ELEVENLABS_API_KEY)
+        self.voice_retry_job = None
+        self.voice_retry_ms = VOICE_RETRY_MS
         self.chat_image = ctk.CTkImage(light_image=Image.open(os.path.join(self.image_path, "chat_dark.png")),
                                        dark_image=Image.open(os.path.join(self.image_path, "chat_light.png")), size=(20, 20))
         self.play_image = ctk.CTkImage(light_image=Image.open(
             os.path.join(self.image_path, "play.png")), size=(80, 80))
         self.pause_image = ctk.CTkImage(light_image=Image.open(
             os.path.join(self.image_path, "pause.png")), size=(80, 80))
-        whisper_api_installed = 'openai' in sys.modules
-        whisper_local_installed = 'whisper' in sys.modules
+        # Detect the optional backends without importing them
+        whisper_api_installed = is_available('openai')
+        whisper_local_installed = is_available('whisper')
 
         # Create a list to hold the available Whisper options
         self.whisper_options = []
@@ -75,17 +103,22 @@ class ElevenGUI:
             self.whisper_options.append("Whisper API")
         if whisper_local_installed:
             self.whisper_options.append("Whisper Local")
+        self.whisper_models = WhisperModelManager()
+        self.history_store = HistoryStore()
+        self.history_items = []
+        self.history_rows = []
+        self.history_render_job = None
+        self.history_search_job = None
+        self.export_progress = None
         self.current_selected_row = None
         self.history_frame_visible = False
         self.configure_grid()
         self.init_ui()
-        self.audio_data_played = 0
         self.temp_audio_file_name = None
-        self.audio_playback_finished = False
         self.is_playing = False
         self.is_paused = False
         self.is_recording = False
-        self.stream = None
+        self.playback = PlaybackEngine()
         # Need both of these values to correctly update the audio position in the GUI
         self.audio_length = 0
         self.correct_audio_pos = 0
@@ -97,8 +130,77 @@ class ElevenGUI:
         self.new_audio_position = 0
         self.current_length = 0
 
+        # Paint the window first, then load voices and quota on background workers
+        self.root.after_idle(self.report_first_paint)
+        self.load_startup_data()
+
         self.root.mainloop()
 
+    def report_first_paint(self):
+        self.root.update_idletasks()
+        elapsed = (time.perf_counter() - STARTUP_TIME) * 1000
+        print(f"Startup: first paint after {elapsed:.0f} ms")
+
+    def run_in_background(self, work, on_done):
+        # Runs work() on a worker thread and on_done(result) on the Tk thread.
+        # Call it on the Tk thread.
+        def run():
+            result = None
+            try:
+                result = work()
+            finally:
+                self.dispatcher.post(on_done, result)
+                self.dispatcher.work_finished()
+
+        self.dispatcher.work_started()
+        Thread(target=run, daemon=True).start()
+
+    def load_startup_data(self):
+        def timed(name, work):
+            def run():
+                start = time.perf_counter()
+                value = work()
+                print(f"Startup: {name} loaded in {(time.perf_counter() - start) * 1000:.0f} ms (background)")
+                return value
+            return run
+
+        if self.voice_catalog.is_stale():
+            self.reload_voices(timed("voices", self.voice_catalog.refresh))
+        else:
+            self.on_voices_loaded()
+        # Reconciled with the account now, then every few minutes
+        self.run_in_background(timed("quota", self.quota.reconcile),
+                               lambda reconciled: self.schedule_quota_reconcile())
+        if WHISPER_PRELOAD and "Whisper Local" in self.whisper_options:
+            self.whisper_models.preload_async()
+
+    def schedule_quota_reconcile(self):
+        # A Tk timer rather than a thread of its own, so the update is posted by counted background work
+        self.root.after(self.quota.reconcile_seconds * 1000, lambda: self.run_in_background(
+            self.quota.reconcile, lambda reconciled: self.schedule_quota_reconcile()))
+
+    def reload_voices(self, refresh=None):
+        if self.voice_retry_job is not None:
+            self.root.after_cancel(self.voice_retry_job)
+            self.voice_retry_job = None
+        self.update_voice_menu()
+        self.run_in_background(refresh or self.voice_catalog.refresh,
+                               lambda changed: self.on_voices_loaded())
+
+    def on_voices_loaded(self):
+        if not self.voice_catalog.voices:
+            # Nothing fetched and no snapshot: say so, and retry unless the user reloads first
+            self.voice_selection_optionmenu.configure(values=["Reload voices"])
+            self.voice_selection_optionmenu.set("Voices unavailable")
+            self.voice_retry_job = self.root.after(self.voice_retry_ms, self.reload_voices)
+            self.voice_retry_ms = min(self.voice_retry_ms * 2, VOICE_RETRY_MAX_MS)
+            return
+        self.voice_retry_ms = VOICE_RETRY_MS
+        self.update_voice_menu()
+        # Fill the preview cache once the window is up and idle
+        self.root.after(PREVIEW_PREFETCH_DELAY_MS, lambda: self.root.after_idle(
+            prefetch_voice_previews, self.voice_catalog))
+
     def configure_grid(self):
         self.root.grid_columnconfigure(1, weight=1)
         self.root.grid_rowconfigure(0, weight=0)
@@ -114,14 +216,32 @@ class ElevenGUI:
     def create_text_box(self):
         text_box = ctk.CTkTextbox(self.root, wrap=ctk.WORD)
         text_box.grid(row=2, column=1, sticky="nsew", padx=10, pady=(10, 0))
+        # Counts and estimates follow the text through <<Modified>>, not through key bindings
+        self.text_model = TextModel(text_box, on_length=self.on_text_length_changed,
+                                    on_analysis=self.on_text_analyzed)
         text_box.bind('<Control-v>', lambda event: custom_paste(event,
-                      text_box, self.char_count, self.generate_button))
+                      text_box, self.text_model, self.char_limit()))
         text_box.bind('<Any-KeyPress>', lambda event: check_character_limit(event,
-                      text_box, self.char_count, self.generate_button))
-        text_box.bind('<Button-1>', lambda event: check_character_limit(
-            event, text_box, self.char_count, self.generate_button))
+                      self.text_model, self.char_limit()))
         return text_box
 
+    def on_text_length_changed(self, length):
+        show_character_count(length, self.char_count, self.generate_button,
+                             self.ticks, self.char_limit())
+
+    def on_text_analyzed(self, text):
+        show_cost_estimate(text, self.estimate_label, self.long_form_switch.get())
+
+    def char_limit(self):
+        # Long-form mode splits the text into several requests, so the per-request cap does not apply
+        if self.long_form_switch.get():
+            return LONG_FORM_CHAR_LIMIT
+        return MAX_REQUEST_CHARS
+
+    def on_long_form_toggled(self):
+        # The limit and the number of requests depend on the mode
+        self.text_model.refresh()
+
     def create_text_status_frame(self):
         self.text_status_frame = ctk.CTkFrame(
             self.root, fg_color="transparent")
@@ -131,6 +251,18 @@ class ElevenGUI:
             self.text_status_frame, text="0/5000", font=("Arial", 12), state="disabled")
         char_count.pack(side=ctk.LEFT, padx=10, pady=0)
 
+        self.stream_switch = ctk.CTkSwitch(
+            self.text_status_frame, text="Stream", font=("Arial", 12))
+        self.stream_switch.pack(side=ctk.LEFT, padx=10, pady=0)
+
+        self.long_form_switch = ctk.CTkSwitch(
+            self.text_status_frame, text="Long-form", font=("Arial", 12), command=self.on_long_form_toggled)
+        self.long_form_switch.pack(side=ctk.LEFT, padx=10, pady=0)
+
+        self.estimate_label = ctk.CTkLabel(
+            self.text_status_frame, text="", font=("Arial", 12), state="disabled")
+        self.estimate_label.pack(side=ctk.LEFT, padx=10, pady=0)
+
         right_button = ctk.CTkLabel(
             self.text_status_frame, text="total quota used: 0 ", font=("Arial", 12), state="disabled")
         right_button.pack(side=ctk.RIGHT, padx=10, pady=0)
@@ -155,9 +287,16 @@ class ElevenGUI:
         generate_button_frame = ctk.CTkFrame(
             self.root, fg_color="transparent")
         generate_button_frame.grid(row=5, column=1, sticky="ew", pady=10)
-        self.progressbar = ctk.CTkProgressBar(generate_button_frame)
+        # The progress bar and the time-to-first-audio label are shown together while generating
+        self.progress_frame = ctk.CTkFrame(
+            generate_button_frame, fg_color="transparent")
+        self.progressbar = ctk.CTkProgressBar(self.progress_frame)
         self.progressbar.configure(mode="indeterminate")
-        self.generate_button = ctk.CTkButton(generate_button_frame, text="Generate", command=lambda: Thread(target=generate_async, args=(self, ELEVENLABS_API_KEY, self.right_button, self.progressbar, self.generate_button)).start()
+        self.progressbar.pack(side="left", fill="x", expand=True)
+        self.ttfa_label = ctk.CTkLabel(
+            self.progress_frame, text="", font=("Arial", 12), state="disabled")
+        self.ttfa_label.pack(side="right", padx=(10, 0))
+        self.generate_button = ctk.CTkButton(generate_button_frame, text="Generate", command=lambda: generate_async(self, ELEVENLABS_API_KEY, self.right_button, self.progressbar, self.generate_button)
                                              )
         self.generate_button.pack(padx=10, pady=10, fill="x")
 
@@ -172,17 +311,35 @@ class ElevenGUI:
 
         self.preview_button = ctk.CTkButton(voice_selection_frame, corner_radius=8, width=4, border_spacing=10,
                                             fg_color="transparent", text_color=("gray10", "gray90"), hover_color=("gray70", "gray30"),
-                                            image=self.chat_image, anchor="e", text="", command=lambda: play_voice_preview(self.voices_data, self.voice_selection_optionmenu, grab_preview))
+                                            image=self.chat_image, anchor="e", text="", command=lambda: play_voice_preview(self.voice_catalog, self.voice_selection_optionmenu, grab_preview))
         self.preview_button.pack(side="right")
-        voices = fetch_voices(ELEVENLABS_API_KEY)
-        voice_names = ["Select voice:"] + [voice['name'] for voice in voices]
         self.voice_selection_optionmenu = ctk.CTkOptionMenu(
-            voice_selection_frame, values=voice_names,
+            voice_selection_frame, values=["Select voice:"],
             command=self.on_voice_selection_changed, dynamic_resizing=True)
         self.voice_selection_optionmenu.pack(
             side="left", pady=5, fill="x")
+        self.update_voice_menu()
+
+    def update_voice_menu(self):
+        voice_names = self.voice_catalog.names()
+        if voice_names:
+            self.voice_selection_optionmenu.configure(
+                values=["Select voice:"] + voice_names)
+            if self.voice_selection_optionmenu.get() in ("Loading voices...", "Voices unavailable"):
+                self.voice_selection_optionmenu.set("Select voice:")
+        else:
+            # Placeholder until the first background fetch finishes
+            self.voice_selection_optionmenu.set("Loading voices...")
 
     def on_voice_selection_changed(self, *args):
+        if self.voice_selection_optionmenu.get() == "Reload voices":
+            self.reload_voices()
+            return
+        # Decode the selected voice's preview ahead of a click on the preview button
+        preview_url = grab_preview(
+            self.voice_catalog, self.voice_selection_optionmenu.get())
+        if preview_url is not None:
+            get_voice_preview_cache().request(preview_url)
         if self.history_frame_visible:
             self.populate_table()
 
@@ -301,6 +458,17 @@ class ElevenGUI:
             self.tts_menu = ctk.CTkOptionMenu(
                 self.tabview.tab("Speech to Text"), values=self.whisper_options)
             self.tts_menu.grid(row=2, column=0, padx=20, pady=10)
+        if "Whisper Local" in self.whisper_options:
+            self.whisper_model_menu = ctk.CTkOptionMenu(
+                self.tabview.tab("Speech to Text"), values=WHISPER_MODEL_SIZES,
+                command=self.whisper_models.set_model_name)
+            self.whisper_model_menu.set(self.whisper_models.model_name)
+            self.whisper_model_menu.grid(row=3, column=0, padx=20, pady=10)
+        self.live_switch = ctk.CTkSwitch(
+            self.tabview.tab("Speech to Text"), text="Live transcription")
+        self.live_switch.grid(row=5, column=0, padx=20, pady=10)
+        self.tabview.tab("Speech to Text").grid_rowconfigure(4, weight=1)
+        self.create_transcription_jobs_frame(self.tabview.tab("Speech to Text"))
 
     def create_rightbar(self):
         rightbar_frame = ctk.CTkFrame(self.root, width=140, corner_radius=0)
@@ -336,12 +504,6 @@ class ElevenGUI:
 
         return audiobar_frame
 
-    def record_callback(self, indata, frames, time, status):
-        if status:
-            print(status, file=sys.stderr)
-        if self.is_recording:
-            self.recorded_audio.append(indata.copy())
-
     def record_audio(self):
         if len(self.whisper_options) == 0:
             print("No speech to text options are available. Please install either 'openai' or 'whisper' to enable speech to text functionality.")
@@ -349,83 +511,210 @@ class ElevenGUI:
         if not self.is_recording:
             self.is_recording = True
             self.record_button.configure(text="Stop recording")
-            self.recorded_audio = []
-            self.stream = sd.InputStream(
-                samplerate=44100, channels=2, callback=self.record_callback)
-            self.stream.start()
+            # The recording is written to disk while it is captured
+            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio_file:
+                output_file = temp_audio_file.name
+            self.recorder = StreamingRecorder(output_file)
+            self.segmenter = None
+            # Live segments are submitted from the recorder's writer thread until it stops
+            self.dispatcher.work_started()
+            if self.live_switch.get():
+                self.start_live_transcription()
+            self.recorder.start()
         else:
             self.is_recording = False
             self.record_button.configure(text="Record Audio")
-            self.stream.stop()
-            self.stream.close()
 
-            # Process the recorded audio and save it to a temporary file
+            # Finish the recording and transcribe it on a worker thread
             try:
-                audio_data = np.concatenate(self.recorded_audio, axis=0)
-                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio_file:
-                    output_file = temp_audio_file.name
-                    sf.write(output_file, audio_data, 44100, 'PCM_24')
-                    print(f"Audio saved to {output_file}")
-
-                    # Transcribe the recorded audio and paste it into the textbox
-                    transcribed_text = self.transcribe_audio(output_file)
-                    print(transcribed_text)
-                    self.text_box.delete("1.0", "end")
-                    self.text_box.insert("1.0", transcribed_text)
-                    dummy_event = type("DummyEvent", (object,), {
-                        "keysym": None})()
-                    check_character_limit(
-                        dummy_event, self.text_box, self.char_count, self.generate_button)
-
-                # File is now closed, delete it.
-                temp_audio_file.close()
-                time.sleep(1)  # wait for 1 second
-                os.unlink(output_file)
-
+                output_file = self.recorder.stop()
+                print(f"Audio saved to {output_file}")
+                if self.segmenter is not None:
+                    # Everything but the last segment has been transcribed already
+                    self.segmenter.flush()
+                    os.remove(output_file)
+                else:
+                    self.submit_transcription(output_file, label="Recording", delete_file=True)
             except Exception as e:
                 logging.exception("Error processing recorded audio: %s", e)
+            self.dispatcher.work_finished()
+            self.recorder = None
+            self.segmenter = None
+
+    def start_live_transcription(self):
+        # Speech segments are cut at pauses and transcribed while recording continues
+        backend = self.selected_whisper_option()
+        segment_count = itertools.count(1)
+
+        def on_segment(audio):
+            # Runs on the recorder's writer thread
+            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as segment_file:
+                segment_path = segment_file.name
+            sf.write(segment_path, audio, self.recorder.samplerate, 'PCM_16')
+            self.transcription_queue.submit(
+                segment_path, backend, f"Live segment {next(segment_count)}", delete_file=True)
+
+        def feed(block, samplerate):
+            if self.segmenter is None:
+                self.segmenter = VoiceActivitySegmenter(samplerate, on_segment)
+            self.segmenter.feed(block)
+
+        self.recorder.block_listener = feed
 
     def upload_audio(self):
-        # Open a file dialog and get the selected file's path
-        file_path = filedialog.askopenfilename(
+        # Open a file dialog and get the selected files' paths
+        file_paths = filedialog.askopenfilenames(
             filetypes=[("Audio files", "*.wav *.mp3")])
 
         if len(self.whisper_options) == 0:
             print("No speech to text  options are available. Please install either 'openai' or 'whisper' to enable speech to text functionality.")
             return
 
-        if file_path:
-            # Transcribe the uploaded audio and paste it into the textbox
-            transcribed_text = self.transcribe_audio(file_path)
-            print(transcribed_text)
-            self.text_box.delete("1.0", "end")
-            self.text_box.insert("1.0", transcribed_text)
-            dummy_event = type("DummyEvent", (object,), {"keysym": None})()
-            check_character_limit(dummy_event, self.text_box,
-                                  self.char_count, self.generate_button)
+        if file_paths:
+            # Several uploads are queued and transcribed in the background
+            for file_path in file_paths:
+                self.submit_transcription(file_path)
         else:
             print("No file selected")
 
-    def transcribe_audio(self, audio_file):
+    def selected_whisper_option(self):
         # Retrieve the selected option from the menu only if both are available
-
         if len(self.whisper_options) > 1:
-            selected_option = self.tts_menu.get()
+            return self.tts_menu.get()
+        return self.whisper_options[0]
+
+    def submit_transcription(self, audio_file, label=None, delete_file=False):
+        # The backend is read here because worker threads must not touch the widgets
+        self.transcription_queue.submit(
+            audio_file, self.selected_whisper_option(), label, delete_file)
+
+    def run_transcription_job(self, job):
+        # Runs on a transcription worker thread
+        return self.transcribe_audio(
+            job.audio_file, job.backend,
+            on_progress=lambda value: self.transcription_queue.report_progress(job, value),
+            cancelled=lambda: job.cancelled)
+
+    def create_transcription_jobs_frame(self, tab):
+        self.jobs_frame = ctk.CTkScrollableFrame(
+            tab, height=180, label_text="Transcriptions")
+        self.jobs_frame.grid(row=4, column=0, padx=10, pady=10, sticky="nsew")
+        self.jobs_frame.grid_columnconfigure(0, weight=1)
+        self.job_rows = {}
+        self.finished_jobs = {}
+        self.next_job_to_insert = 1
+        # Job updates are shown on the Tk thread; a job's pending updates collapse into its latest state
+        self.transcription_queue = TranscriptionQueue(
+            self.run_transcription_job,
+            on_update=self.on_transcription_update)
+
+    def on_transcription_update(self, job):
+        # Called from the submitting thread for a new job, else from a worker.
+        # A job counts as outstanding work from its first update to its last.
+        if job.status == TranscriptionJob.QUEUED:
+            self.dispatcher.work_started()
+        self.dispatcher.post_latest(("job", job.id), self.show_transcription_job, job)
+        if job.finished:
+            self.dispatcher.work_finished()
+
+    def show_transcription_job(self, job):
+        # job is a JobUpdate snapshot, not the live job
+        row = self.job_rows.get(job.id)
+        if row is None:
+            frame = ctk.CTkFrame(self.jobs_frame, fg_color="transparent")
+            frame.grid(row=job.id, column=0, sticky="ew", pady=(0, 5))
+            frame.grid_columnconfigure(0, weight=1)
+            label = ctk.CTkLabel(frame, text="", font=("Arial", 12), anchor="w")
+            label.grid(row=0, column=0, sticky="ew")
+            cancel_button = ctk.CTkButton(frame, text="✕", width=24,
+                                          command=lambda job_id=job.id: self.transcription_queue.cancel(job_id))
+            cancel_button.grid(row=0, column=1, padx=(5, 0))
+            progressbar = ctk.CTkProgressBar(frame, height=8)
+            progressbar.grid(row=1, column=0, columnspan=2, sticky="ew")
+            row = {"frame": frame, "label": label,
+                   "progressbar": progressbar, "cancel_button": cancel_button}
+            self.job_rows[job.id] = row
+
+        row["label"].configure(text=f"{job.label}: {job.status}")
+        progressbar = row["progressbar"]
+        if job.progress is None:
+            if progressbar.cget("mode") != "indeterminate":
+                progressbar.configure(mode="indeterminate")
+                progressbar.start()
         else:
-            selected_option = self.whisper_options[0]
+            progressbar.stop()
+            progressbar.configure(mode="determinate")
+            progressbar.set(job.progress)
+
+        if job.finished:
+            row["cancel_button"].configure(state="disabled")
+            if job.status == TranscriptionJob.FAILED:
+                logging.error("Error transcribing %s: %s", job.label, job.error)
+            self.root.after(JOB_ROW_LINGER_MS, lambda: self.remove_job_row(job.id))
+            # Results are inserted in submission order, even if workers finish out of order
+            if job.id >= self.next_job_to_insert:
+                self.finished_jobs[job.id] = job
+            while self.next_job_to_insert in self.finished_jobs:
+                finished_job = self.finished_jobs.pop(self.next_job_to_insert)
+                self.next_job_to_insert += 1
+                if finished_job.status == TranscriptionJob.DONE:
+                    print(finished_job.result)
+                    self.insert_transcription(finished_job.result)
+
+    def remove_job_row(self, job_id):
+        row = self.job_rows.pop(job_id, None)
+        if row is not None:
+            row["frame"].destroy()
+
+    def insert_transcription(self, transcribed_text):
+        # Queued results are appended so one job does not overwrite another
+        if not transcribed_text:
+            return
+        if self.text_box.get("1.0", "end-1c").strip():
+            transcribed_text = " " + transcribed_text
+        self.text_box.insert("end", transcribed_text)
+
+    def transcribe_with_api(self, audio_file):
+        import openai
+        with open(audio_file, "rb") as file:
+            result = openai.Audio.transcribe(
+                model="whisper-1",
+                file=file,
+                response_format="json"
+            )
+        return result["text"]   # Updated according to OpenAI API response
+
+    def transcribe_audio(self, audio_file, selected_option=None, on_progress=None, cancelled=None):
+        if selected_option is None:
+            selected_option = self.selected_whisper_option()
 
         if selected_option == "Whisper API":
-            with open(audio_file, "rb") as file:
-                result = openai.Audio.transcribe(
-                    model="whisper-1",
-                    file=file,
-                    response_format="json"
-                )
-            text = result["text"]   # Updated according to OpenAI API response
+            # Upload compact 16 kHz mono chunks instead of the raw file
+            chunk_files = prepare_for_upload(audio_file, cancelled=cancelled)
+            try:
+                texts = []
+                with ThreadPoolExecutor(max_workers=WHISPER_API_WORKERS) as pool:
+                    futures = [pool.submit(self.transcribe_with_api, chunk_file) for chunk_file in chunk_files]
+                    # Results are read in chunk order
+                    for future in futures:
+                        if cancelled and cancelled():
+                            # Chunks that have not started are not uploaded; the result is dropped anyway
+                            for pending in futures:
+                                pending.cancel()
+                            break
+                        texts.append(future.result())
+                        if on_progress:
+                            on_progress(len(texts) / len(chunk_files))
+            finally:
+                for chunk_file in chunk_files:
+                    os.remove(chunk_file)
+            text = " ".join(texts)
         elif selected_option == "Whisper Local":
-            model = whisper.load_model("base.en")
-            result = model.transcribe(audio_file, suppress_tokens='')
+            # The model stays loaded between transcriptions
+            result = self.whisper_models.transcribe(audio_file, suppress_tokens='')
             text = result["text"]
+            timings = self.whisper_models.timings()
+            print(f"Whisper {timings['model']}: transcribed in {timings['transcribe_seconds']:.1f} s")
 
         # Add spaces before and after punctuation marks, excluding apostrophes
         text = re.sub(r'(?<=\w)([^\w\s\'])(?=\w)', r' \1 ', text)
@@ -437,106 +726,71 @@ class ElevenGUI:
         return text
 
     def update_audio_pos(self):
-        # print("update_audio_pos called")  # Add this line
-        if self.is_paused or self.is_stopped or self.audio_data_played >= len(self.audio_data):
-            pass
-        else:
-            current_audio_pos_seconds = self.audio_data_played / self.samplerate
-            # print(f"current_audio_pos_seconds: {current_audio_pos_seconds}")  # Add this line
-
-            if self.audio_length != 0:
-                slider_percentage = (
-                    current_audio_pos_seconds / self.audio_length) * 100
+        # Tick subscriber: returns False, which ends the updates, once nothing is playing
+        if self.is_paused or self.is_stopped:
+            return False
+        if self.playback.finished:
+            if self.playback.queued:
+                # The next track may still have to be downloaded, which must not block the Tk thread
+                self.run_in_background(self.playback.resolve_next, self.start_next_track)
             else:
-                # Handle the case where audio_length is zero
-                slider_percentage = 0
-
-            self.audio_pos_slider.set(slider_percentage)
-            converted_to_time = convert(current_audio_pos_seconds)
-            self.audio_curr_pos.configure(text=f"{converted_to_time}")
-            self.new_audio_position = current_audio_pos_seconds
-            if slider_percentage >= 95:
-                self.audio_pos_slider.set(100)
-                self.play_button.configure(image=self.play_image)
+                self.show_playback_finished()
+            return False
+
+        if self.playback.path != self.temp_audio_file_name:
+            # The next queued track has started
+            self.temp_audio_file_name = self.playback.path
+            self.audio_length = self.playback.duration
+            self.ticks.configure(self.audio_end_pos, text=convert(self.audio_length))
+        current_audio_pos_seconds = self.playback.position
+
+        if self.audio_length != 0:
+            slider_percentage = (
+                current_audio_pos_seconds / self.audio_length) * 100
+        else:
+            # Handle the case where audio_length is zero
+            slider_percentage = 0
+
+        self.ticks.set(self.audio_pos_slider, slider_percentage)
+        converted_to_time = convert(current_audio_pos_seconds)
+        self.ticks.configure(self.audio_curr_pos, text=f"{converted_to_time}")
+        self.new_audio_position = current_audio_pos_seconds
+        return True
+
+    def start_next_track(self, path):
+        if not self.playback.finished:
+            # Stopped or replaced while the track was being resolved
+            return
+        if self.playback.advance():
+            self.start_audio_pos_update_loop()
+        else:
+            self.show_playback_finished()
 
-        self.root.after(10, self.update_audio_pos)
+    def show_playback_finished(self):
+        self.ticks.set(self.audio_pos_slider, 100)
+        self.boolean_switch("stop")
+        self.play_button_check()
 
     # Function to handle the event when the user clicks the slider
     def start_audio_pos_update_loop(self):
         self.is_paused = False
         self.is_stopped = False
-        self.update_audio_pos()
-
-    def audio_callback(self, outdata: np.ndarray, frames: int, time, status) -> None:
-        if status:
-            print(status, file=sys.stderr)
-
-        if self.audio_playback_finished:
-            # fill the buffer with zeros to prevent any residual noise
-            outdata.fill(0)
-
-            return
-
-        remaining_frames = len(self.audio_data) - self.audio_data_played
-
-        if remaining_frames >= frames:
-            chunk = self.audio_data[self.audio_data_played:self.audio_data_played + frames]
-            self.audio_data_played += frames
-        else:
-            chunk = np.concatenate(
-                (self.audio_data[self.audio_data_played:], np.zeros(frames - remaining_frames)))
-            self.audio_data_played += len(chunk)
-
-        chunk_stereo = np.repeat(chunk[np.newaxis], 2, axis=0).T
-        outdata[:] = chunk_stereo
-
-        if self.audio_data_played >= len(self.audio_data):
-            self.audio_playback_finished = True
-
-    def new_audio_callback(self, outdata, frames, time, status):
-        if status:
-            print(status, file=sys.stderr)
-
-        chunk_size = frames
-        start = self.audio_data_played
-        stop = start + chunk_size
-
-        if len(self.audio_data.shape) > 1:
-            num_channels = self.audio_data.shape[1]
-        else:
-            num_channels = 1
-
-        if stop > self.audio_data.shape[0]:
-            stop = self.audio_data.shape[0]
-            chunk_size = stop - start
-
-        if num_channels > 1:
-            outdata[:, 0] = self.audio_data[start:stop, 0]
-            outdata[:, 1] = self.audio_data[start:stop, 1]
-        else:
-            outdata[:, 0] = self.audio_data[start:stop]
-            outdata[:, 1] = self.audio_data[start:stop]
-
-        self.audio_data_played += chunk_size
+        self.ticks.subscribe("audio position", self.update_audio_pos)
 
     def stop_audio_pos_update_loop(self):
         self.is_stopped = True
+        self.ticks.unsubscribe("audio position")
 
     def play_button_check(self):
         if self.is_playing:  # If a song is playing
             # Changes the button from "Play" to "Pause"
             self.play_button.configure(image=self.pause_image)
-
-            self.root.update()
         elif self.is_paused:  # If a song is paused
             # Changes the button from "Pause" to "Resume"
             self.play_button.configure(image=self.play_image)
-
-            self.root.update()
         elif self.is_stopped:  # If a song is stopped
             # Changes the button to "Play"
             self.play_button.configure(image=self.play_image)
-            self.root.update()
 
     # Function that sets the main booleans to True or False depending on the input parameter.
     def boolean_switch(self, input):
@@ -587,50 +841,125 @@ class ElevenGUI:
         self.table.update_idletasks()
 
     def on_treeview_select(self, event, root):
-        # Check if there is a selected item
-        if not self.table.selection():
+        # Only a single selected row is played; several are selected for export
+        if len(self.table.selection()) != 1:
             return
         selected_item = self.table.selection()[0]
         history_item_id = self.table.item(selected_item, "tags")[0]
+        self.current_selected_row = history_item_id
         delay = 50
 
         # Stop and unload the current audio
         stop_and_unload_audio(self)
 
-        # Close the current stream if it's playing
-        if self.stream:
-            self.stream.stop()
-            self.stream.close()
-            self.stream = None
-
         # Load the new audio after a short delay
         self.root.after(delay, lambda: get_history_audio(
             self, history_item_id))
+        self.prefetch_neighbour_audio(self.table.index(selected_item))
+
+    def prefetch_neighbour_audio(self, row):
+        # Rows are rendered in history_rows order, so the table index is the list index
+        first = max(row - HISTORY_AUDIO_PREFETCH_ROWS, 0)
+        neighbours = self.history_rows[first:row + HISTORY_AUDIO_PREFETCH_ROWS + 1]
+        history_item_ids = [str(item["history_item_id"]) for item in neighbours]
+        prefetch_history_audio(ELEVENLABS_API_KEY, [
+            history_item_id for history_item_id in history_item_ids if history_item_id != self.current_selected_row])
+
+    def sync_history(self):
+        # Pulls only the items newer than the local copy, then refreshes the table if anything arrived
+        def sync():
+            try:
+                return self.history_store.sync(ELEVENLABS_API_KEY)
+            except requests.RequestException as e:
+                print(f"Failed to sync the history: {e}")
+                return 0
+
+        def on_synced(new_items):
+            print(f"History sync: {new_items} new items")
+            if new_items and self.history_frame_visible:
+                self.load_history()
+
+        self.run_in_background(sync, on_synced)
+
+    def refresh_history(self):
+        # Reloads the table after new items arrived, if it is showing
+        if self.history_frame_visible:
+            self.load_history()
+
+    def load_history(self):
+        # The whole history is read from the local store once; filtering happens in memory
+        self.history_items = self.history_store.items()
+        self.populate_table()
+
+    def history_filters(self):
+        # Search bar contents as HistoryStore.search arguments; blank or invalid fields are ignored
+        return {
+            "text": self.history_search_entry.get().strip() or None,
+            "date_from": parse_date_filter(self.history_date_from_entry.get()),
+            "date_to": parse_date_filter(self.history_date_to_entry.get(), end_of_day=True),
+            "stability_range": parse_range_filter(self.history_stability_entry.get()),
+            "similarity_range": parse_range_filter(self.history_similarity_entry.get()),
+        }
+
+    def schedule_history_search(self, event=None):
+        if self.history_search_job:
+            self.root.after_cancel(self.history_search_job)
+        self.history_search_job = self.root.after(HISTORY_SEARCH_DELAY_MS, self.run_history_search)
+
+    def run_history_search(self):
+        self.history_search_job = None
+        self.populate_table()
 
     def populate_table(self):
         print("Populating table...")
 
         # Clear the current content of the table
-        for item in self.table.get_children():
-            self.table.delete(item)
+        self.cancel_history_render()
+        self.table.delete(*self.table.get_children())
 
         selected_voice_name = self.voice_selection_optionmenu.get()
-        data = fetch_history(ELEVENLABS_API_KEY)
-        max_line_width = 75
-
-        for item in data:
-            # Skip the item if the voice name doesn't match the selected voice
-            if selected_voice_name != "Select voice:" and item["voice_name"] != selected_voice_name:
-                continue
-
-            wrapped_text = wrap_text(item["text"], max_line_width)
-            formatted_date = unix_to_date(item["date_unix"])
-            settings = item["settings"]
-            stability = settings.get("stability", "N/A")
-            similarity_boost = settings.get("similarity_boost", "N/A")
-            self.table.insert("", "end", tags=(str(item["history_item_id"]),), values=(
-                f"{item['voice_name']}\n{formatted_date}", f"Stability: {stability}\nSimilarity Boost: {similarity_boost}", wrapped_text))
-        print("Populated table successfully.")
+        if selected_voice_name in ("Select voice:", "Loading voices...", "Voices unavailable"):
+            selected_voice_name = None
+        filters = self.history_filters()
+        if any(value is not None for value in filters.values()):
+            # Text and range queries go to the store's full-text index
+            self.history_rows = self.history_store.search(voice_name=selected_voice_name, **filters)
+        elif selected_voice_name is None:
+            self.history_rows = self.history_items
+        else:
+            self.history_rows = [item for item in self.history_items
+                                 if item["voice_name"] == selected_voice_name]
+
+        # Rows are only materialized once they are about to scroll into view
+        self.rendered_rows = 0
+        self.render_target = HISTORY_LOOKAHEAD_ROWS
+        self.render_history_rows()
+
+    def render_history_rows(self):
+        # Inserts one batch per Tk tick so a long history never blocks the loop
+        self.history_render_job = None
+        target = min(self.render_target, len(self.history_rows))
+        end = min(self.rendered_rows + HISTORY_BATCH_SIZE, target)
+        for item in self.history_rows[self.rendered_rows:end]:
+            self.table.insert("", "end", tags=(str(item["history_item_id"]),),
+                              values=format_history_row(item))
+        self.rendered_rows = end
+        if self.rendered_rows < target:
+            self.history_render_job = self.root.after(1, self.render_history_rows)
+        elif self.rendered_rows == len(self.history_rows):
+            print("Populated table successfully.")
+
+    def cancel_history_render(self):
+        if getattr(self, "history_render_job", None):
+            self.root.after_cancel(self.history_render_job)
+            self.history_render_job = None
+
+    def on_table_scroll(self, first, last):
+        # Grow the materialized window when the view nears the last rendered row
+        if float(last) >= HISTORY_PREFETCH_FRACTION and self.rendered_rows < len(self.history_rows):
+            self.render_target = self.rendered_rows + HISTORY_LOOKAHEAD_ROWS
+            if self.history_render_job is None:
+                self.render_history_rows()
 
     def create_table(self):
         self.style = ttk.Style()
@@ -655,8 +984,9 @@ class ElevenGUI:
         self.table = ttk.Treeview(self.add_menu_display,
                                   columns=('voice_name', 'settings',
                                            'text'),
-                                  selectmode='browse',
-                                  show='headings')
+                                  selectmode='extended',
+                                  show='headings',
+                                  yscrollcommand=self.on_table_scroll)
 
         self.table.column("#1", anchor="w", minwidth=5, stretch=False)
         self.table.column("#2", anchor="w", minwidth=5, stretch=False)
@@ -666,10 +996,145 @@ class ElevenGUI:
         self.table.heading('settings', text='Settings', anchor="w")
         self.table.heading('text', text='Text', anchor="w")
 
-        self.table.grid(row=0, column=0, sticky='nsew', padx=10, pady=10)
+        self.table.grid(row=1, column=0, sticky='nsew', padx=10, pady=10)
 
         self.table.bind("<<TreeviewSelect>>",
                         lambda event: self.on_treeview_select(self, event))
+
+    def create_history_search_bar(self):
+        search_bar = ctk.CTkFrame(self.add_menu_display, fg_color="transparent")
+        search_bar.grid(row=0, column=0, sticky='ew', padx=10, pady=(10, 0))
+        search_bar.grid_columnconfigure(0, weight=1)
+
+        self.history_search_entry = ctk.CTkEntry(
+            search_bar, placeholder_text="Search history...")
+        self.history_search_entry.grid(row=0, column=0, sticky='ew', padx=(0, 10))
+        self.history_date_from_entry = ctk.CTkEntry(
+            search_bar, width=110, placeholder_text="From YYYY-MM-DD")
+        self.history_date_from_entry.grid(row=0, column=1, padx=(0, 10))
+        self.history_date_to_entry = ctk.CTkEntry(
+            search_bar, width=110, placeholder_text="To YYYY-MM-DD")
+        self.history_date_to_entry.grid(row=0, column=2, padx=(0, 10))
+        self.history_stability_entry = ctk.CTkEntry(
+            search_bar, width=110, placeholder_text="Stability 0-1")
+        self.history_stability_entry.grid(row=0, column=3, padx=(0, 10))
+        self.history_similarity_entry = ctk.CTkEntry(
+            search_bar, width=110, placeholder_text="Similarity 0-1")
+        self.history_similarity_entry.grid(row=0, column=4, padx=(0, 10))
+
+        for entry in (self.history_search_entry, self.history_date_from_entry,
+                      self.history_date_to_entry, self.history_stability_entry,
+                      self.history_similarity_entry):
+            entry.bind("<KeyRelease>", self.schedule_history_search)
+
+        self.export_menu = ctk.CTkOptionMenu(
+            search_bar, width=130, values=["Export selected", "Export filtered", "Export all"],
+            command=self.export_history)
+        self.export_menu.set("Export...")
+        self.export_menu.grid(row=0, column=5, padx=(0, 10))
+        self.export_zip_switch = ctk.CTkSwitch(search_bar, text="ZIP", width=60)
+        self.export_zip_switch.grid(row=0, column=6, padx=(0, 10))
+        self.play_all_button = ctk.CTkButton(
+            search_bar, text="Play all", width=80, command=self.play_history_queue)
+        self.play_all_button.grid(row=0, column=7)
+
+        # Shown while an export runs
+        self.export_progress_frame = ctk.CTkFrame(search_bar, fg_color="transparent")
+        self.export_progress_frame.grid_columnconfigure(0, weight=1)
+        self.export_progressbar = ctk.CTkProgressBar(self.export_progress_frame, height=8)
+        self.export_progressbar.grid(row=0, column=0, sticky='ew', padx=(0, 10))
+        self.export_progress_label = ctk.CTkLabel(self.export_progress_frame, text="", font=("Arial", 12))
+        self.export_progress_label.grid(row=0, column=1)
+
+    def export_history(self, choice):
+        self.export_menu.set("Export...")
+        if self.export_progress is not None:
+            print("An export is already running")
+            return
+        if choice == "Export selected":
+            selected_ids = {self.table.item(row, "tags")[0] for row in self.table.selection()}
+            items = [item for item in self.history_rows if str(item["history_item_id"]) in selected_ids]
+        elif choice == "Export filtered":
+            items = list(self.history_rows)
+        else:
+            items = self.history_store.items()
+        if not items:
+            print("Nothing to export")
+            return
+
+        as_zip = self.export_zip_switch.get()
+        if as_zip:
+            destination = filedialog.asksaveasfilename(
+                defaultextension=".zip", filetypes=[("ZIP archive", "*.zip")])
+        else:
+            destination = filedialog.askdirectory()
+        if not destination:
+            return
+
+        # Written by the export thread, read by update_export_progress
+        self.export_progress = (0, len(items))
+
+        def on_progress(done, total):
+            self.export_progress = (done, total)
+
+        def export():
+            export_function = export_to_zip if as_zip else export_to_directory
+            try:
+                return export_function(ELEVENLABS_API_KEY, items, destination, on_progress=on_progress)
+            except OSError as e:
+                print(f"Export failed: {e}")
+                return None
+
+        def on_done(counts):
+            self.export_progress = None
+            self.export_progress_frame.grid_forget()
+            if counts is not None:
+                exported, skipped, failed = counts
+                print(f"Export to {destination}: {exported} exported, {skipped} already there, {failed} failed")
+
+        self.export_progressbar.set(0)
+        self.export_progress_frame.grid(row=1, column=0, columnspan=8, sticky='ew', pady=(5, 0))
+        self.run_in_background(export, on_done)
+        self.ticks.subscribe("export progress", self.update_export_progress)
+
+    def play_history_queue(self):
+        # Plays every row in the current view back to back; each item is
+        # downloaded on the decoder thread while the one before it plays
+        history_item_ids = [str(item["history_item_id"]) for item in self.history_rows]
+        if not history_item_ids:
+            return
+
+        def source(index):
+            def resolve():
+                prefetch_history_audio(ELEVENLABS_API_KEY, history_item_ids[
+                    index + 1:index + 1 + HISTORY_AUDIO_PREFETCH_ROWS])
+                return history_audio_path(ELEVENLABS_API_KEY, history_item_ids[index])
+            return resolve
+
+        def first_track():
+            try:
+                return source(0)()
+            except requests.RequestException as e:
+                print(f"Error with history audio: {e}")
+                return None
+
+        def on_first_track(path):
+            if path is None:
+                return
+            stop_and_unload_audio(self)
+            self.current_selected_row = None
+            load_temp_audio(self, path, [source(index) for index in range(1, len(history_item_ids))])
+            play_temp_audio(self)
+
+        self.run_in_background(first_track, on_first_track)
+
+    def update_export_progress(self):
+        if self.export_progress is None:
+            return False
+        done, total = self.export_progress
+        self.ticks.set(self.export_progressbar, done / total)
+        self.ticks.configure(self.export_progress_label, text=f"{done}/{total}")
+        return True
     # --------------------------------------------------------------------------------------------
 
     def init_ui(self):
@@ -687,8 +1152,6 @@ class ElevenGUI:
         self.create_voice_selection_frame(self.top_frame)
         self.create_slider_bar_frame()
 
-        update_quota(ELEVENLABS_API_KEY, self.right_button)
-
     def update_stability_value(self, val):
         percentage = float(val) * 100
         self.stability_val.configure(text=f"{percentage:.0f}%")
@@ -747,11 +1210,13 @@ class ElevenGUI:
         self.add_menu_display.grid(pady=15, padx=15, sticky="nwse")
         self.history_frame.grid_rowconfigure(0, weight=1)
         self.history_frame.grid_columnconfigure(0, weight=1)
-        self.add_menu_display.grid_rowconfigure(0, weight=1)
+        self.add_menu_display.grid_rowconfigure(1, weight=1)
         self.add_menu_display.grid_columnconfigure(0, weight=1)
+        self.create_history_search_bar()
         self.create_table()
         self.update_table_style()
-        self.populate_table()
+        self.load_history()
+        self.sync_history()
 
     def clear_content_frames(self):
         for widget in self.root.grid_slaves():
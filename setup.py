@@ -7,6 +7,12 @@ setup(
     url='https://github.com/winedarkmoon/ElevenGUI',
     author='winedarkmoon',
     license='MIT',
+    # Installed under the project's name rather than as a top-level "utils"
+    packages=['elevengui.utils'],
+    package_dir={'elevengui.utils': 'utils'},
+    entry_points={
+        'console_scripts': ['elevengui-batch=elevengui.utils.batch_cli:main'],
+    },
     install_requires=[
         'certifi==2023.5.7',
         'cffi==1.15.1',
@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip("requests")
+
+from utils import history_store
+from utils.history_store import HistoryStore
+
+
+class FakeHistoryServer:
+    # Serves /v1/history pages newest first; fails once after `fail_after` pages
+    def __init__(self, count):
+        self.items = []
+        self.add(count)
+        self.fail_after = None
+        self.pages_served = 0
+
+    def add(self, count):
+        start = len(self.items)
+        new = [{"history_item_id": f"item{i}", "text": f"text {i}", "voice_name": "voice",
+                "date_unix": 1000 + i} for i in range(start, start + count)]
+        self.items = list(reversed(new)) + self.items
+
+    def fetch_page(self, api_key, page_size, start_after_history_item_id=None):
+        if self.fail_after is not None and self.pages_served >= self.fail_after:
+            self.fail_after = None
+            raise history_store.requests.ConnectionError("interrupted")
+        self.pages_served += 1
+        start = 0
+        if start_after_history_item_id:
+            ids = [item["history_item_id"] for item in self.items]
+            start = ids.index(start_after_history_item_id) + 1
+        page = self.items[start:start + page_size]
+        return {"history": page, "has_more": start + page_size < len(self.items),
+                "last_history_item_id": page[-1]["history_item_id"] if page else None}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeHistoryServer(4)
+    monkeypatch.setattr(history_store, "fetch_history_page", server.fetch_page)
+    return server
+
+
+def test_initial_sync_resumes_after_interruption(tmp_path, server):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    server.add(16)
+    server.fail_after = 2
+    with pytest.raises(history_store.requests.RequestException):
+        store.sync("key", page_size=4)
+    store.sync("key", page_size=4)
+    assert store.count() == 20
+
+
+def test_interrupted_incremental_sync_loses_no_items(tmp_path, server):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    assert store.sync("key", page_size=4) == 4
+
+    server.add(16)
+    server.pages_served = 0
+    server.fail_after = 1
+    with pytest.raises(history_store.requests.RequestException):
+        store.sync("key", page_size=4)
+    assert store.sync("key", page_size=4) == 16
+    assert store.count() == 20
+    assert [item["history_item_id"] for item in store.items()][-1] == "item0"
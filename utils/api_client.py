@@ -0,0 +1,82 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY')
+API_BASE_URL = "https://api.elevenlabs.io"
+
+# Connection pool and retry settings, overridable from the .env file
+POOL_SIZE = int(os.getenv('ELEVENGUI_POOL_SIZE', 10))
+CONNECT_TIMEOUT = float(os.getenv('ELEVENGUI_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.getenv('ELEVENGUI_READ_TIMEOUT', 60))
+MAX_RETRIES = int(os.getenv('ELEVENGUI_MAX_RETRIES', 3))
+BACKOFF_FACTOR = float(os.getenv('ELEVENGUI_BACKOFF_FACTOR', 0.5))
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_size=POOL_SIZE, max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR):
+    # Connection errors are retried for every method. Read errors and 5xx
+    # responses are only retried for idempotent methods (urllib3's default
+    # allowed_methods), so a text-to-speech POST is never billed twice.
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size,
+                          pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    return session
+
+
+def get_session():
+    # One keep-alive session is shared by every thread in the app
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def api_url(path):
+    if path.startswith("http://") or path.startswith("https://"):
+        return path
+    return f"{API_BASE_URL}{path}"
+
+
+def request(method, path, api_key=None, headers=None, **kwargs):
+    all_headers = {}
+    if api_key:
+        all_headers["xi-api-key"] = api_key
+    if headers:
+        all_headers.update(headers)
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    return get_session().request(method, api_url(path), headers=all_headers, **kwargs)
+
+
+def get(path, api_key=None, **kwargs):
+    return request("GET", path, api_key=api_key, **kwargs)
+
+
+def post(path, api_key=None, **kwargs):
+    return request("POST", path, api_key=api_key, **kwargs)
+
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,110 @@
+import os
+import tempfile
+from .lazy_import import lazy_import
+from .vad import FRAME_SECONDS, frame_features
+
+np = lazy_import('numpy')
+sf = lazy_import('soundfile')
+
+# The Whisper API rejects uploads over 25 MB
+WHISPER_API_MAX_BYTES = int(os.getenv('ELEVENGUI_WHISPER_API_MAX_MB', 24)) * 1024 * 1024
+WHISPER_API_WORKERS = int(os.getenv('ELEVENGUI_WHISPER_API_WORKERS', 4))
+UPLOAD_SAMPLERATE = 16000
+UPLOAD_FORMAT = os.getenv('ELEVENGUI_WHISPER_API_FORMAT', 'FLAC')
+SILENCE_RMS = 0.01
+EDGE_PADDING_SECONDS = 0.2
+# Chunks are cut at the quietest frame in this last part of the allowed length
+SPLIT_SEARCH_FRACTION = 0.2
+RESAMPLE_TAPS = 63
+
+_FORMAT_SUFFIXES = {"FLAC": ".flac", "OGG": ".ogg", "WAV": ".wav"}
+_FORMAT_SUBTYPES = {"FLAC": "PCM_16", "OGG": "VORBIS", "WAV": "PCM_16"}
+
+
+def load_mono(path):
+    data, samplerate = sf.read(path, dtype='float32', always_2d=True)
+    return data.mean(axis=1), samplerate
+
+
+def resample(audio, samplerate, target_samplerate=UPLOAD_SAMPLERATE):
+    if samplerate == target_samplerate or len(audio) == 0:
+        return audio
+    if target_samplerate < samplerate:
+        # Windowed-sinc low-pass below the new Nyquist frequency against aliasing
+        cutoff = 0.45 * target_samplerate / samplerate
+        n = np.arange(RESAMPLE_TAPS) - (RESAMPLE_TAPS - 1) / 2
+        taps = np.sinc(2 * cutoff * n) * np.hamming(RESAMPLE_TAPS)
+        audio = np.convolve(audio, (taps / taps.sum()).astype(np.float32), mode='same')
+    count = int(round(len(audio) * target_samplerate / samplerate))
+    positions = np.linspace(0, len(audio) - 1, count)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def frame_levels(audio, samplerate):
+    frame_length = int(FRAME_SECONDS * samplerate)
+    count = len(audio) // frame_length
+    if count == 0:
+        return np.zeros(0, dtype=np.float32), frame_length
+    rms, _ = frame_features(audio[:count * frame_length].reshape(count, frame_length))
+    return rms, frame_length
+
+
+def strip_leading_trailing_silence(audio, samplerate, threshold=SILENCE_RMS, padding=EDGE_PADDING_SECONDS):
+    # Frame-RMS based, unlike utils.synthesis.trim_silence which works on sample peaks
+    rms, frame_length = frame_levels(audio, samplerate)
+    loud = np.flatnonzero(rms > threshold)
+    if loud.size == 0:
+        return audio
+    pad = int(padding * samplerate)
+    start = max(loud[0] * frame_length - pad, 0)
+    stop = min((loud[-1] + 1) * frame_length + pad, len(audio))
+    return audio[start:stop]
+
+
+def split_at_silences(audio, samplerate, max_samples):
+    # Cuts the audio into pieces of at most max_samples, each ending at the
+    # quietest frame near its end so words are not cut in half
+    rms, frame_length = frame_levels(audio, samplerate)
+    chunks = []
+    start = 0
+    while len(audio) - start > max_samples:
+        end = start + max_samples
+        first_frame = (end - int(max_samples * SPLIT_SEARCH_FRACTION)) // frame_length
+        last_frame = end // frame_length
+        window = rms[first_frame:last_frame]
+        if window.size:
+            end = (first_frame + int(np.argmin(window))) * frame_length + frame_length // 2
+        chunks.append(audio[start:end])
+        start = end
+    chunks.append(audio[start:])
+    return chunks
+
+
+def encode(audio, samplerate, upload_format=UPLOAD_FORMAT):
+    with tempfile.NamedTemporaryFile(suffix=_FORMAT_SUFFIXES[upload_format], delete=False) as f:
+        path = f.name
+    sf.write(path, audio, samplerate, format=upload_format, subtype=_FORMAT_SUBTYPES[upload_format])
+    return path
+
+
+def prepare_for_upload(path, max_bytes=WHISPER_API_MAX_BYTES, upload_format=UPLOAD_FORMAT, cancelled=None):
+    # Returns compact temporary files (mono, 16 kHz, trimmed, compressed) in
+    # order, split at silences if a single file would exceed max_bytes.
+    # The caller removes them. Returns [] once cancelled() is true.
+    audio, samplerate = load_mono(path)
+    audio = strip_leading_trailing_silence(resample(audio, samplerate), UPLOAD_SAMPLERATE)
+    encoded = encode(audio, UPLOAD_SAMPLERATE, upload_format)
+    size = os.path.getsize(encoded)
+    if size <= max_bytes:
+        return [encoded]
+    os.remove(encoded)
+    # Compressed size is roughly proportional to duration; leave a margin
+    max_samples = int(len(audio) * max_bytes / size * 0.9)
+    chunk_files = []
+    for chunk in split_at_silences(audio, UPLOAD_SAMPLERATE, max_samples):
+        if cancelled and cancelled():
+            for chunk_file in chunk_files:
+                os.remove(chunk_file)
+            return []
+        chunk_files.append(encode(chunk, UPLOAD_SAMPLERATE, upload_format))
+    return chunk_files
@@ -0,0 +1,191 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dotenv import load_dotenv
+from .quota import QuotaTracker
+from .synthesis import (DEFAULT_OUTPUT_FORMAT, MAX_REQUEST_CHARS, STREAM_OUTPUT_FORMAT,
+                        billable_characters, build_request_body, synthesize_to_file)
+from .voice_catalog import VoiceCatalog
+
+# Headless batch synthesis.
+#
+#   elevengui-batch manifest.csv [--output-dir DIR] [--workers 4]
+#   python -m utils.batch_cli manifest.jsonl
+#
+# Each manifest row has a voice (name or voice_id), the text, optional
+# stability and similarity (0-1) and the output path, relative to the
+# output directory (by default the manifest's directory). A .wav output is
+# written as PCM, anything else as mp3. Rows whose output already exists are
+# skipped, so rerunning an interrupted batch resumes it.
+
+BATCH_WORKERS = int(os.getenv('ELEVENGUI_BATCH_WORKERS', 4))
+DEFAULT_STABILITY = 0.75
+DEFAULT_SIMILARITY = 0.75
+# A progress line is printed after this many finished rows
+PROGRESS_INTERVAL = 50
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def read_manifest(path):
+    # Rows as dicts from a CSV file with a header line, or from JSON lines
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            return [json.loads(line) for line in f if line.strip()]
+        return list(csv.DictReader(f))
+
+
+def _setting(row, names, default):
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ""):
+            return float(value)
+    return default
+
+
+def prepare_jobs(rows, voice_catalog, output_dir):
+    # Returns (jobs, skipped, invalid). A job is (output path, voice_id, request body).
+    jobs = []
+    skipped = invalid = 0
+    for number, row in enumerate(rows, 1):
+        voice = (row.get("voice") or row.get("voice_name") or "").strip()
+        text = row.get("text") or ""
+        output = (row.get("output") or row.get("output_path") or "").strip()
+        voice_id = voice_catalog.voice_id_for(voice) or (voice if voice_catalog.by_id(voice) else None)
+        try:
+            stability = _setting(row, ("stability",), DEFAULT_STABILITY)
+            similarity = _setting(row, ("similarity", "similarity_boost"), DEFAULT_SIMILARITY)
+        except ValueError as e:
+            print(f"Row {number}: invalid setting: {e}")
+            invalid += 1
+            continue
+        if not output or not text.strip():
+            print(f"Row {number}: needs a text and an output path")
+            invalid += 1
+            continue
+        if voice_id is None:
+            print(f"Row {number}: unknown voice {voice!r}")
+            invalid += 1
+            continue
+        path = os.path.join(output_dir, output)
+        if os.path.exists(path):
+            skipped += 1
+            continue
+        jobs.append((path, voice_id, build_request_body(text, stability, similarity)))
+    return jobs, skipped, invalid
+
+
+def _output_format(path):
+    return STREAM_OUTPUT_FORMAT if path.lower().endswith(".wav") else DEFAULT_OUTPUT_FORMAT
+
+
+def run_batch(api_key, jobs, workers=BATCH_WORKERS, quota=None):
+    # Synthesizes every job on a pool of workers. Returns a stats dict.
+    stats = {"done": 0, "failed": 0, "characters": 0, "billed": 0, "cached_chunks": 0}
+    lock = threading.Lock()
+
+    def run_job(path, voice_id, request_body):
+        billed = []
+        cached = []
+
+        def on_chunk(chunk_text, from_cache):
+            (cached if from_cache else billed).append(len(chunk_text))
+            # Recorded per chunk, so the chunks billed before a failure still count
+            if quota is not None and not from_cache:
+                quota.record(len(chunk_text))
+
+        synthesize_to_file(api_key, voice_id, request_body, path, on_chunk=on_chunk)
+        with lock:
+            stats["characters"] += len(request_body["text"])
+            stats["billed"] += sum(billed)
+            stats["cached_chunks"] += len(cached)
+
+    start_time = time.perf_counter()
+    # At most two jobs per worker are queued, so memory stays flat for any batch size
+    queued = iter(jobs)
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            while len(in_flight) < workers * 2:
+                job = next(queued, None)
+                if job is None:
+                    break
+                in_flight[pool.submit(run_job, *job)] = job[0]
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path = in_flight.pop(future)
+                try:
+                    future.result()
+                    stats["done"] += 1
+                except Exception as e:
+                    print(f"Failed to synthesize {path}: {e}")
+                    stats["failed"] += 1
+                finished_rows = stats["done"] + stats["failed"]
+                if finished_rows % PROGRESS_INTERVAL == 0:
+                    print_stats(stats, time.perf_counter() - start_time, len(jobs))
+    stats["seconds"] = time.perf_counter() - start_time
+    return stats
+
+
+def print_stats(stats, seconds, total):
+    seconds = max(seconds, 1e-6)
+    print(f"{stats['done'] + stats['failed']}/{total} rows in {seconds:.1f} s: "
+          f"{stats['done'] / seconds:.2f} rows/s, {stats['characters'] / seconds:.0f} chars/s, "
+          f"{stats['billed']} characters billed, {stats['cached_chunks']} chunks from the cache, "
+          f"{stats['failed']} failed")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthesize every row of a CSV or JSONL manifest.")
+    parser.add_argument("manifest")
+    parser.add_argument("--output-dir", help="base directory of the output paths (default: the manifest's)")
+    parser.add_argument("--workers", type=positive_int, default=BATCH_WORKERS)
+    parser.add_argument("--api-key", help="defaults to ELEVENLABS_API_KEY")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api_key = args.api_key or os.getenv('ELEVENLABS_API_KEY')
+    if not api_key:
+        print("No API key: set ELEVENLABS_API_KEY or pass --api-key")
+        return 2
+    output_dir = args.output_dir or os.path.dirname(os.path.abspath(args.manifest))
+
+    voice_catalog = VoiceCatalog(api_key)
+    voice_catalog.ensure_loaded()
+    jobs, skipped, invalid = prepare_jobs(read_manifest(args.manifest), voice_catalog, output_dir)
+    print(f"{len(jobs)} rows to synthesize, {skipped} already done, {invalid} invalid")
+    if not jobs:
+        return 1 if invalid else 0
+
+    # The whole batch is checked against the quota before the first request
+    quota = QuotaTracker(api_key)
+    quota.reconcile()
+    # Split the same way as synthesize_to_file(), so cached chunks are recognized
+    characters = sum(billable_characters(voice_id, body, _output_format(path),
+                                         long_form=len(body["text"]) > MAX_REQUEST_CHARS)
+                     for path, voice_id, body in jobs)
+    status, message = quota.check(characters)
+    if message:
+        print(f"Quota: {message}")
+    if status == QuotaTracker.BLOCK:
+        return 1
+
+    stats = run_batch(api_key, jobs, args.workers, quota)
+    print_stats(stats, stats["seconds"], len(jobs))
+    return 1 if stats["failed"] or invalid else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import os
+import queue
+import threading
+import traceback
+
+DISPATCH_INTERVAL_MS = 16
+DISPATCH_MAX_BATCH = int(os.getenv('ELEVENGUI_DISPATCH_MAX_BATCH', 100))
+
+
+class MainThreadDispatcher:
+    # Worker threads must not touch Tk widgets. They post() calls here
+    # instead, and the Tk loop runs them in batches of at most max_batch, so
+    # a burst of updates never stalls the window. post_latest() keeps only
+    # the newest pending call per key, for updates where only the latest
+    # state matters.
+    #
+    # Workers never call into Tk, not even to wake it: a Tk call from another
+    # thread waits for the Tk loop and deadlocks while the Tk thread is
+    # joining that worker. Instead the queue is polled from the Tk thread,
+    # only while background work is outstanding: work_started() is called
+    # on the Tk thread before starting work that posts (or from work that is
+    # itself counted), and work_finished() from any thread once it has
+    # posted its last call. With nothing outstanding nothing is scheduled.
+
+    def __init__(self, root, max_batch=DISPATCH_MAX_BATCH, interval_ms=DISPATCH_INTERVAL_MS):
+        self.root = root
+        self.max_batch = max_batch
+        self.interval_ms = interval_ms
+        self._queue = queue.SimpleQueue()
+        self._latest = {}  # key -> (func, args) not run yet
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._polling = False  # only used on the Tk thread
+        self._main_thread = threading.current_thread()
+
+    def work_started(self):
+        with self._lock:
+            self._outstanding += 1
+        self._poll_if_main_thread()
+
+    def work_finished(self):
+        with self._lock:
+            self._outstanding -= 1
+
+    def post(self, func, *args, **kwargs):
+        self._queue.put((func, args, kwargs))
+        self._poll_if_main_thread()
+
+    def post_latest(self, key, func, *args):
+        with self._lock:
+            queued = key in self._latest
+            self._latest[key] = (func, args)
+        if not queued:
+            self._queue.put((self._run_latest, (key,), {}))
+        self._poll_if_main_thread()
+
+    def _poll_if_main_thread(self):
+        if threading.current_thread() is self._main_thread and not self._polling:
+            self._polling = True
+            self.root.after_idle(self._drain)
+
+    def _run_latest(self, key):
+        with self._lock:
+            func, args = self._latest.pop(key)
+        func(*args)
+
+    def _drain(self):
+        handled = 0
+        while handled < self.max_batch:
+            try:
+                func, args, kwargs = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                traceback.print_exc()
+            handled += 1
+
+        # A worker posts before it finishes, so an empty queue with nothing
+        # outstanding means nothing more can arrive
+        with self._lock:
+            idle = self._outstanding == 0 and self._queue.empty()
+        if idle:
+            self._polling = False
+            return
+        # After a full batch more is waiting; let Tk handle its own events, then continue
+        self.root.after(1 if handled == self.max_batch else self.interval_ms, self._drain)
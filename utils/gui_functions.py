@@ -7,28 +7,28 @@ import os
 import threading
 from dotenv import load_dotenv
 import time
-import sounddevice as sd
-import soundfile as sf
 from io import BytesIO
+from collections import OrderedDict
+from .lazy_import import lazy_import
+from .disk_cache import CACHE_DIR
+from .history_store import HISTORY_AUDIO_CACHE_DIR, history_audio_path
+from .preview_cache import PreviewCache
+from .quota import QuotaTracker
+from .synthesis import (DEFAULT_OUTPUT_FORMAT, MAX_REQUEST_CHARS, STREAM_OUTPUT_FORMAT,
+                        SynthesisError, billable_characters, build_request_body,
+                        estimate_cost, fetch_speech,
+                        pcm_samplerate, pcm_to_float32, play_audio_blocks,
+                        get_speech_cache, play_pcm_stream, speech_cache_key,
+                        stream_speech, synthesize_long_form)
+
+# Audio libraries are imported on first use to keep startup fast
+sd = lazy_import('sounddevice')
+sf = lazy_import('soundfile')
 
 load_dotenv()
 ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY')
 
 
-def fetch_history(api_key):
-    url = "https://api.elevenlabs.io/v1/history"
-    headers = {"xi-api-key": api_key}
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # raise exception if the response contains an HTTP error status code
-        data = response.json()
-        return data["history"]
-    except Exception as e:
-        print(f"Failed to fetch the history: {e}")
-        return []  # return an empty list if fetching the history fails
-
-
-
 def wrap_text(text, max_line_width):
     words = text.split()
     lines = []
@@ -56,36 +56,90 @@ def unix_to_date(unix_timestamp):
     return dt_object.strftime('%m.%d.%y, %H:%M')
 
 
-def check_character_limit(event, text_box, char_count, generate_button):
-    current_length = len(text_box.get("1.0", 'end-1c'))
-    # print(current_length)
-    char_count.configure(text=f"{current_length}/5000")
+def parse_date_filter(text, end_of_day=False):
+    # "YYYY-MM-DD" to a unix timestamp at the start (or end) of that day; None if blank or invalid
+    try:
+        day = datetime.datetime.strptime(text.strip(), '%Y-%m-%d')
+    except ValueError:
+        return None
+    if end_of_day:
+        day += datetime.timedelta(days=1, seconds=-1)
+    return int(day.timestamp())
 
-    # Disable the button if the limit is reached
-    if current_length >= 5000 or current_length == 0:
-        generate_button.configure(state="disabled")
-    else:
-        generate_button.configure(state="normal")
 
+def parse_range_filter(text):
+    # "0.3-0.8" to (0.3, 0.8), a single number to an exact match; None if blank or invalid
+    parts = text.replace(" ", "").split("-")
+    try:
+        values = [float(part) for part in parts if part]
+    except ValueError:
+        return None
+    if len(values) == 1:
+        return values[0], values[0]
+    if len(values) == 2:
+        return min(values), max(values)
+    return None
+
+
+# Formatted history rows, memoized by item id since history items never change
+HISTORY_ROW_CACHE_SIZE = 20000
+_history_row_cache = OrderedDict()
+
+
+def format_history_row(item, max_line_width=75):
+    key = (item["history_item_id"], max_line_width)
+    values = _history_row_cache.get(key)
+    if values is not None:
+        _history_row_cache.move_to_end(key)
+        return values
+    wrapped_text = wrap_text(item["text"], max_line_width)
+    formatted_date = unix_to_date(item["date_unix"])
+    settings = item["settings"]
+    stability = settings.get("stability", "N/A")
+    similarity_boost = settings.get("similarity_boost", "N/A")
+    values = (f"{item['voice_name']}\n{formatted_date}",
+              f"Stability: {stability}\nSimilarity Boost: {similarity_boost}", wrapped_text)
+    _history_row_cache[key] = values
+    if len(_history_row_cache) > HISTORY_ROW_CACHE_SIZE:
+        _history_row_cache.popitem(last=False)
+    return values
+
+
+def check_character_limit(event, text_model, char_limit=MAX_REQUEST_CHARS):
     # If the character limit is exceeded, allow only backspace and delete events
-    if current_length >= 5000 and event.keysym not in ['BackSpace', 'Delete']:
+    if text_model.length >= char_limit and event.keysym not in ['BackSpace', 'Delete']:
         return "break"
 
-    # Update the text box after handling cut and paste events
-    if event.keysym in ['Control_L', 'Control_R']:
-        text_box.after(50, lambda: check_character_limit(
-            event, text_box, char_count, generate_button))
 
+def show_character_count(length, char_count, generate_button, ticks, char_limit=MAX_REQUEST_CHARS):
+    # Called on every edit; the tick scheduler merges the label updates of fast typing
+    ticks.configure(char_count, text=f"{length}/{char_limit}")
+
+    # Disable the button if the limit is reached
+    if length >= char_limit or length == 0:
+        ticks.configure(generate_button, state="disabled")
+    else:
+        ticks.configure(generate_button, state="normal")
 
-def custom_paste(event, text_box, char_count, generate_button):
+
+def show_cost_estimate(text, estimate_label, long_form=False):
+    requests_needed, characters = estimate_cost(text, long_form)
+    if requests_needed == 0:
+        estimate_label.configure(text="")
+        return
+    plural = "s" if requests_needed != 1 else ""
+    estimate_label.configure(text=f"{requests_needed} request{plural}, ~{characters} credits")
+
+
+def custom_paste(event, text_box, text_model, char_limit=MAX_REQUEST_CHARS):
     try:
         pasted_text = text_box.clipboard_get()
     except ctk.TclError:
         # There's nothing in the clipboard, or it's not text
         return
 
-    current_length = len(text_box.get("1.0", 'end-1c'))
-    remaining_chars = 5000 - current_length
+    current_length = text_model.length
+    remaining_chars = char_limit - current_length
 
     # Only insert the text if it doesn't exceed the limit
     if len(pasted_text) <= remaining_chars:
@@ -97,108 +151,168 @@ def custom_paste(event, text_box, char_count, generate_button):
     return "break"
 
 
-def grab_preview(voices_data, selected_voice_name):
-    # Get the selected voice name
-    print(selected_voice_name)
-
-    # Get the voice_id corresponding to the selected voice name
-    preview_url = None
-    for voice in voices_data:
-        if voice["name"] == selected_voice_name:
-            preview_url = voice["preview_url"]
-            print(preview_url)
+def grab_preview(voice_catalog, selected_voice_name):
+    # Get the preview url corresponding to the selected voice name
+    preview_url = voice_catalog.preview_url_for(selected_voice_name)
+    print(selected_voice_name, preview_url)
     return preview_url
 
 
-def fetch_voices(api_key):
-    url = "https://api.elevenlabs.io/v1/voices"
-    headers = {"xi-api-key": api_key}
+def show_quota(right_button, quota):
+    if quota is not None:
+        quota_used, quota_total = quota
+        right_button.configure(
+            text=f"total quota used: {quota_used} / {quota_total}")
 
-    try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            voices_data = data['voices']
-            return voices_data
-        else:
-            print("Error fetching voices")
-            return []
-    except requests.RequestException:
-        print("Unable to connect to ElevenLabs API. Please check your internet connection.")
-        return []
 
-
-def update_quota(api_key, right_button):
-    url = "https://api.elevenlabs.io/v1/user"
-    headers = {"xi-api-key": api_key}
-    try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            quota_used = data['subscription']['character_count']
-            quota_total = data['subscription']['character_limit']
-
-            right_button.configure(
-                text=f"total quota used: {quota_used} / {quota_total}")
-        else:
-            print("Error updating quota.")
-    except requests.exceptions.ConnectionError:
-        print("Unable to connect to ElevenLabs API. Please check your internet connection.")
+_voice_preview_cache = None
+_voice_preview_cache_lock = threading.Lock()
 
 
+def get_voice_preview_cache():
+    # Decoded previews are kept in memory, the downloaded files on disk.
+    # Created on first use, so importing this module creates no directories.
+    global _voice_preview_cache
+    if _voice_preview_cache is None:
+        with _voice_preview_cache_lock:
+            if _voice_preview_cache is None:
+                _voice_preview_cache = PreviewCache(os.path.join(CACHE_DIR, "previews"))
+    return _voice_preview_cache
 
-# Declare a dictionary for caching audio files
-voice_preview_cache = {}
 
-
-def play_voice_preview(voices_data, voice_selection_optionmenu, grab_preview: Callable):
+def play_voice_preview(voice_catalog, voice_selection_optionmenu, grab_preview: Callable):
     selected_voice_name = voice_selection_optionmenu.get()
 
-    def play_audio_callback(audio_data, samplerate):
+    def play_audio_callback(audio):
+        audio_data, samplerate = audio
         sd.play(audio_data, samplerate)
 
-    def download_and_cache_preview(voice_name, preview_url, callback):
-        response = requests.get(preview_url)
+    preview_url = grab_preview(voice_catalog, selected_voice_name)
+    if preview_url is not None:
+        get_voice_preview_cache().request(preview_url, play_audio_callback)
+
+
+def prefetch_voice_previews(voice_catalog):
+    # Downloads missing previews in the background so the preview button plays right away
+    get_voice_preview_cache().prefetch(voice.get("preview_url") for voice in voice_catalog.voices)
+
+
+def generate_event(self, ELEVENLABS_API_KEY, right_button, progressbar, voice_id, request_body,
+                   long_form=False, stream=False):
+    # Runs on a worker thread: every widget update goes through self.dispatcher
+    start_time = time.perf_counter()
+    post = self.dispatcher.post
+
+    def show_time_to_first_audio(seconds):
+        print(f"Time to first audio: {seconds:.2f} s")
+        post(self.ttfa_label.configure, text=f"first audio: {seconds:.2f} s")
+
+    def finish(generated=False):
+        stats = get_speech_cache().stats()
+        print(f"Speech cache: {stats['hits']} hits, {stats['misses']} misses")
+        post(progressbar.stop)
+        post(self.progress_frame.pack_forget)
+        if generated:
+            # The new item lands in the local history (and its search index) right away
+            sync_history_after_generation(self, ELEVENLABS_API_KEY)
 
-        if response.status_code == 200:
-            audio_data = response.content
-            audio_file = BytesIO(audio_data)
-            data, samplerate = sf.read(audio_file, dtype='float32')
+    if long_form:
+        # Chunks are synthesized in parallel and played in order as they finish
+        samplerate = pcm_samplerate(STREAM_OUTPUT_FORMAT)
+        billed_chunks = []
 
-            voice_preview_cache[voice_name] = (data, samplerate)
-            # Call the callback function to play the audio
-            callback(data, samplerate)
+        def on_chunk(chunk_text, from_cache):
+            # Recorded per chunk, so the chunks billed before a failure still count
+            if not from_cache:
+                billed_chunks.append(chunk_text)
+                self.quota.record(len(chunk_text))
 
-    if selected_voice_name in voice_preview_cache:
-        audio_data, samplerate = voice_preview_cache[selected_voice_name]
-        play_audio_callback(audio_data, samplerate)
+        try:
+            blocks = synthesize_long_form(
+                ELEVENLABS_API_KEY, voice_id, request_body, STREAM_OUTPUT_FORMAT, on_chunk=on_chunk)
+            audio_data = play_audio_blocks(
+                blocks, samplerate, on_first_audio=show_time_to_first_audio)
+            print("Long-form text-to-speech generation successful")
+            # Keep the stitched result in the audio bar so it can be replayed
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as f:
+                temp_file_path = f.name
+            sf.write(temp_file_path, audio_data, samplerate)
+            post(load_temp_audio, self, temp_file_path)
+        except (SynthesisError, requests.RequestException, sd.PortAudioError) as e:
+            print(f"Error generating long-form text-to-speech: {e}")
+        finish(generated=bool(billed_chunks))
+        return
+
+    if stream:
+        # Start playback on the first chunk instead of waiting for the whole file
+        samplerate = pcm_samplerate(STREAM_OUTPUT_FORMAT)
+        key = speech_cache_key(voice_id, request_body, STREAM_OUTPUT_FORMAT)
+        generated = False
+        try:
+            cached_audio = get_speech_cache().get(key)
+            if cached_audio is not None:
+                print("Playing text-to-speech from the cache")
+                play_audio_blocks([pcm_to_float32(cached_audio)], samplerate,
+                                  on_first_audio=show_time_to_first_audio)
+            else:
+                chunks = stream_speech(ELEVENLABS_API_KEY, voice_id, request_body)
+                audio_bytes = play_pcm_stream(chunks, samplerate,
+                                              on_first_audio=show_time_to_first_audio)
+                get_speech_cache().put(key, audio_bytes)
+                generated = True
+                self.quota.record(len(request_body["text"]))
+                print("Text-to-speech streaming successful")
+        except (SynthesisError, requests.RequestException, sd.PortAudioError) as e:
+            print(f"Error streaming text-to-speech: {e}")
+        finish(generated)
+        return
+
+    # Send the API request, unless the same audio has been generated before
+    try:
+        audio_bytes, from_cache = fetch_speech(
+            ELEVENLABS_API_KEY, voice_id, request_body, DEFAULT_OUTPUT_FORMAT)
+    except (SynthesisError, requests.RequestException) as e:
+        print(f"Error generating text-to-speech: {e}")
+        finish()
+        return
+
+    # Handle the response (e.g., play the audio, display a message, etc.)
+    if from_cache:
+        print("Playing text-to-speech from the cache")
     else:
-        preview_url = grab_preview(voices_data, selected_voice_name)
-        if preview_url is not None:
-            # Create a new thread to download and cache the preview
-            download_thread = threading.Thread(target=download_and_cache_preview, args=(
-                selected_voice_name, preview_url, play_audio_callback))
-            download_thread.start()
+        self.quota.record(len(request_body["text"]))
+        print("Text-to-speech generation successful")
+    audio_data, samplerate = sf.read(BytesIO(audio_bytes))
+    show_time_to_first_audio(time.perf_counter() - start_time)
+    sd.play(audio_data, samplerate)
+    sd.wait()  # Wait for the audio to finish playing
+    finish(generated=not from_cache)
 
 
-def generate_event(self, ELEVENLABS_API_KEY, right_button, progressbar, generate_button):
+def sync_history_after_generation(self, api_key):
+    # Runs on the generation thread; the store is safe to use from any thread
+    try:
+        new_items = self.history_store.sync(api_key)
+    except requests.RequestException as e:
+        print(f"Failed to sync the history: {e}")
+        return
+    if new_items:
+        self.dispatcher.post(self.refresh_history)
+
+
+def generate_async(self, ELEVENLABS_API_KEY, right_button, progressbar, generate_button):
+    # Reads the inputs on the Tk thread, then generates on a worker thread
     print("Generate button clicked")
 
     # Extract the text from the textbox
     text = self.text_box.get("1.0", "end-1c")
-    progressbar.pack(padx=10, pady=10, fill="x", before=generate_button)
-    progressbar.start()
     # Get the selected voice name
     selected_voice_name = self.voice_selection_optionmenu.get()
     print(selected_voice_name)
 
     # Get the voice_id corresponding to the selected voice name
-    voice_id = None
-    for voice in self.voices_data:
-        if voice["name"] == selected_voice_name:
-            voice_id = voice["voice_id"]
-            print(voice_id)
-            break
+    voice_id = self.voice_catalog.voice_id_for(selected_voice_name)
+    print(voice_id)
 
     # Extract the stability and clarity values from the slider settings
     stability = float(self.stability_val.cget("text").replace("%", "")) / 100
@@ -206,39 +320,31 @@ def generate_event(self, ELEVENLABS_API_KEY, right_button, progressbar, generate
         self.clarity_val.cget("text").replace("%", "")) / 100
 
     # Create the request body
-    request_body = {
-        "text": text,
-        "voice_settings": {
-            "stability": stability,
-            "similarity_boost": similarity_boost
-        }
-    }
-
-    # Send the API request
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-    headers = {"xi-api-key": ELEVENLABS_API_KEY,
-               "Content-Type": "application/json"}
-    response = requests.post(url, headers=headers, json=request_body)
-
-    if response.status_code == 200:
-        # Handle the response (e.g., play the audio, display a message, etc.)
-        update_quota(ELEVENLABS_API_KEY, right_button)
-        print("Text-to-speech generation successful")
-        with tempfile.NamedTemporaryFile(delete=False) as f:
-            f.write(response.content)
-            temp_file_path = f.name
-        audio_data, samplerate = sf.read(temp_file_path)
-        sd.play(audio_data, samplerate)
-        sd.wait()  # Wait for the audio to finish playing
-    else:
-        print("Error generating text-to-speech")
-    progressbar.stop()
-    progressbar.pack_forget()
+    request_body = build_request_body(text, stability, similarity_boost)
+
+    # Check the job against the remaining quota before sending anything; cached audio is free
+    long_form = self.long_form_switch.get()
+    stream = self.stream_switch.get()
+    output_format = STREAM_OUTPUT_FORMAT if long_form or stream else DEFAULT_OUTPUT_FORMAT
+    status, message = self.quota.check(billable_characters(voice_id, request_body, output_format, long_form))
+    if message:
+        print(f"Quota: {message}")
+        self.estimate_label.configure(text=message)
+    if status == QuotaTracker.BLOCK:
+        return
 
+    self.ttfa_label.configure(text="")
+    self.progress_frame.pack(padx=10, pady=10, fill="x", before=generate_button)
+    progressbar.start()
+    def run():
+        try:
+            generate_event(self, ELEVENLABS_API_KEY, right_button, progressbar, voice_id, request_body,
+                           long_form, stream)
+        finally:
+            self.dispatcher.work_finished()
 
-def generate_async(self, ELEVENLABS_API_KEY, right_button, progressbar, generate_button):
-    threading.Thread(target=generate_event, args=(self,
-                                                  ELEVENLABS_API_KEY, right_button, progressbar, generate_button)).start()
+    self.dispatcher.work_started()
+    threading.Thread(target=run).start()
 
 # Function that converts an input (in seconds) to "hours : minutes : seconds"
 
@@ -251,112 +357,65 @@ def convert(seconds):
 
 
 def get_history_audio(self, history_item_id):
-    url = f"https://api.elevenlabs.io/v1/history/{history_item_id}/audio"
-    headers = {"xi-api-key": ELEVENLABS_API_KEY}
-    response = requests.get(url, headers=headers)
-
-    if response.status_code == 200:
-        print("good response")
-        audio_data = response.content
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio_file:
-            temp_audio_file.write(audio_data)
-            self.temp_audio_file_name = temp_audio_file.name
-
-        self.audio_file = sf.SoundFile(self.temp_audio_file_name)
-        self.samplerate = self.audio_file.samplerate
-        self.audio_length = len(self.audio_file) / self.samplerate
-        self.audio_end_pos.configure(text=convert(self.audio_length))
+    # Replays come straight from the disk cache; only a miss is downloaded, off the Tk thread
+    def download():
+        try:
+            return history_audio_path(ELEVENLABS_API_KEY, history_item_id)
+        except requests.RequestException as e:
+            print(f"Error with history audio: {e}")
+            return None
+
+    def on_done(path):
+        # Skip it if another row was selected while downloading
+        if path is not None and self.current_selected_row == history_item_id:
+            load_temp_audio(self, path)
+
+    self.run_in_background(download, on_done)
+
+
+def is_cached_history_audio(path):
+    return os.path.dirname(os.path.abspath(path)) == os.path.abspath(HISTORY_AUDIO_CACHE_DIR)
+
+
+def load_temp_audio(self, temp_audio_file_name, queue=()):
+    # Makes the file the current track of the audio bar, followed by the queued sources
+    if self.temp_audio_file_name != temp_audio_file_name:
+        # The previous generation's file is closed before it is deleted
+        self.playback.unload()
+        remove_temp_audio(self)
+    self.temp_audio_file_name = temp_audio_file_name
+    self.playback.load(temp_audio_file_name, queue)
+    self.audio_length = self.playback.duration
+    self.audio_end_pos.configure(text=convert(self.audio_length))
 
-    else:
-        print("Error with history audio")
 
 def play_temp_audio(self):
     if not self.temp_audio_file_name:
         print("No audio file selected!")
         return
 
-    if self.stream and self.stream.active:
-        stop_audio(self)
-    elif self.temp_audio_file_name:
-        # Reset flags
-        self.audio_data_played = 0
-        self.audio_playback_finished = False
-
-        data, samplerate = sf.read(self.temp_audio_file_name)
-        self.audio_data = data.T.copy(order='C')
-        self.samplerate = samplerate
-
-        # Create and start a new output stream
-        self.stream = sd.OutputStream(
-            samplerate=samplerate, channels=2, callback=self.audio_callback, blocksize=2048)
-        self.stream.start()
-
+    if self.playback.is_playing:
+        pause_audio(self)
+    elif self.is_paused:
+        resume_audio(self)
+    else:
+        # Streams from the file; nothing is decoded up front
+        self.playback.play()
         self.status.set("Playing")
         self.boolean_switch("play")
         self.play_button_check()
 
         # Start updating the audio position
-        self.update_audio_pos()
-    elif self.is_paused:
-        self.resume_audio()
-    elif self.is_playing:
-        self.pause_audio()
-    else:
-        print("No temp audio file available")
-
-
-def play_audio(self):
-    if self.temp_audio_file_name:
-        if self.is_playing:
-            pause_audio(self)
-        elif self.is_paused:
-            resume_audio(self)
-        else:
-            if self.stream:
-                self.stream.stop()
-                self.stream.close()
-                self.stream = samplerate
-
-            data, samplerate = sf.read(self.temp_audio_file_name)
-            self.audio_data = data.T.copy(order='C')
-            self.audio_data_played = 0
-            self.samplerate = samplerate
-
-            sd.play(data, samplerate)
-            self.status.set("Playing")
-            self.boolean_switch("play")
-            self.play_button_check()
-            self.update_audio_pos()
-
-            try:
-                x = threading.Thread(target=self.update_audio_pos, daemon=True)
-                x.start()
-            except Exception as e:
-                print("\n[DEBUG]", e)
-
-            def monitor_playback():
-                while not self.audio_playback_finished:
-                    time.sleep(0.1)
-                self.stop_and_unload_audio()
-
-            self.audio_playback_finished = False
-            playback_monitor_thread = threading.Thread(
-                target=monitor_playback, daemon=True)
-            playback_monitor_thread.start()
-    else:
-        print("No audio file loaded")
+        self.ticks.subscribe("audio position", self.update_audio_pos)
 
 
 def update_play_status(self):
-    if self.stream and self.stream.active:
-        self.is_playing = True
-    else:
-        self.is_playing = False
+    self.is_playing = self.playback.is_playing
 
 
 def pause_audio(self):
-    if self.stream:
-        self.stream.stop()
+    if self.playback.is_playing:
+        self.playback.pause()
         self.status.set("Paused")
         self.boolean_switch("pause")
         self.play_button_check()
@@ -364,18 +423,15 @@ def pause_audio(self):
 
 def resume_audio(self):
     if self.is_paused:
-        # Resume the audio stream
-        self.stream.start()
-
+        self.playback.resume()
         self.status.set("Playing")
         self.boolean_switch("play")
         self.play_button_check()
+        self.ticks.subscribe("audio position", self.update_audio_pos)
 
 
 def stop_audio(self):
-    self.stream.stop()
-    self.stream.close()
-    self.stream = None
+    self.playback.stop()
     self.current_audio.set("")  # Updates "actual_audio_lbl"
     self.audio_curr_pos.configure(text="0:00")
     # self.audio_end_pos.configure(text="0:00")  # Resetting the GUI
@@ -385,18 +441,23 @@ def stop_audio(self):
     self.play_button_check()
     update_play_status(self)
 
-def stop_and_unload_audio(self):
-    if hasattr(sd, '_stream') and sd.get_stream().active:
-        sd.stop()
-        time.sleep(1)  # Give it a second to fully stop
-        sd.close()
-    # Remove the temporary audio file if it exists
-    if self.temp_audio_file_name:
+
+def remove_temp_audio(self):
+    # Remove the temporary audio file if it exists; cached history audio is kept for replays
+    if self.temp_audio_file_name and is_cached_history_audio(self.temp_audio_file_name):
+        self.temp_audio_file_name = None
+    elif self.temp_audio_file_name:
         try:
             os.remove(self.temp_audio_file_name)
             self.temp_audio_file_name = None
         except PermissionError:
             print(f"Unable to delete file: {self.temp_audio_file_name}. It might still be in use.")
+
+
+def stop_and_unload_audio(self):
+    self.playback.clear_queue()
+    self.playback.unload()
+    remove_temp_audio(self)
     self.audio_curr_pos.configure(text="0:00")
     self.audio_end_pos.configure(text=convert(self.audio_length))  # Resetting the GUI
     self.audio_pos_slider.set(0)  # Resetting the GUI
@@ -0,0 +1,138 @@
+import datetime
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from .history_store import fetch_history_audio, get_history_audio_cache
+from .synthesis import OUTPUT_FILE_MODE
+
+EXPORT_WORKERS = int(os.getenv('ELEVENGUI_EXPORT_WORKERS', 4))
+MANIFEST_NAME = "elevengui_export.json"
+# The manifest is rewritten once this many items were exported since the last save, and at the end
+MANIFEST_SAVE_INTERVAL = 20
+
+_UNSAFE_CHARS_RE = re.compile(r'[^\w\- ]+')
+
+
+def export_file_name(item):
+    # Sorts by date in a file browser and stays unique through the item id
+    date = datetime.datetime.fromtimestamp(item.get("date_unix", 0)).strftime('%Y-%m-%d_%H%M%S')
+    voice = _UNSAFE_CHARS_RE.sub("", item.get("voice_name") or "voice").strip() or "voice"
+    return f"{date}_{voice}_{item['history_item_id']}.mp3"
+
+
+def load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"items": {}}
+
+
+def save_manifest(directory, manifest):
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.chmod(temp_path, OUTPUT_FILE_MODE)
+    os.replace(temp_path, os.path.join(directory, MANIFEST_NAME))
+
+
+def _write_audio(api_key, item, path):
+    # Cached audio is copied; anything else is downloaded straight to the
+    # export so a large export does not flush the playback cache
+    history_item_id = str(item["history_item_id"])
+    cached_path = get_history_audio_cache().get_path(history_item_id)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if cached_path is not None:
+                with open(cached_path, "rb") as cached:
+                    shutil.copyfileobj(cached, f)
+            else:
+                f.write(fetch_history_audio(api_key, history_item_id))
+        os.chmod(temp_path, OUTPUT_FILE_MODE)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return history_item_id
+
+
+def export_to_directory(api_key, items, directory, workers=EXPORT_WORKERS, on_progress=None):
+    # Writes each item's audio into directory. Items recorded in the manifest
+    # whose file is still there are skipped, so an interrupted export resumes
+    # where it stopped. Returns (exported, skipped, failed) counts.
+    os.makedirs(directory, exist_ok=True)
+    manifest = load_manifest(directory)
+    done = manifest.setdefault("items", {})
+    pending = []
+    for item in items:
+        name = done.get(str(item["history_item_id"]))
+        if name is None or not os.path.exists(os.path.join(directory, name)):
+            pending.append(item)
+    skipped = len(items) - len(pending)
+    exported = failed = 0
+    unsaved = 0
+    if on_progress:
+        on_progress(skipped, len(items))
+
+    # At most two downloads per worker are queued, so memory stays flat for any history size
+    queued = iter(pending)
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            while len(in_flight) < workers * 2:
+                item = next(queued, None)
+                if item is None:
+                    break
+                name = export_file_name(item)
+                future = pool.submit(_write_audio, api_key, item, os.path.join(directory, name))
+                in_flight[future] = name
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = in_flight.pop(future)
+                try:
+                    done[future.result()] = name
+                    exported += 1
+                    unsaved += 1
+                except Exception as e:
+                    print(f"Failed to export {name}: {e}")
+                    failed += 1
+            if unsaved >= MANIFEST_SAVE_INTERVAL:
+                save_manifest(directory, manifest)
+                unsaved = 0
+            if on_progress:
+                on_progress(skipped + exported + failed, len(items))
+    save_manifest(directory, manifest)
+    return exported, skipped, failed
+
+
+def export_to_zip(api_key, items, zip_path, workers=EXPORT_WORKERS, on_progress=None):
+    # Files are collected in a staging directory next to the archive, which
+    # makes a ZIP export resumable the same way; the archive is only built
+    # once every item is there.
+    staging = zip_path + ".parts"
+    exported, skipped, failed = export_to_directory(api_key, items, staging, workers, on_progress)
+    if failed:
+        print(f"{failed} items failed; export again to resume before the archive is written")
+        return exported, skipped, failed
+    # Only this selection goes into the archive, not files left in the staging
+    # directory by an earlier export of other items to the same destination
+    done = load_manifest(staging)["items"]
+    names = sorted({done[str(item["history_item_id"])] for item in items})
+    temp_path = zip_path + ".tmp"
+    # mp3 does not compress any further
+    with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_STORED) as archive:
+        for name in names:
+            archive.write(os.path.join(staging, name), name)
+    os.replace(temp_path, zip_path)
+    shutil.rmtree(staging, ignore_errors=True)
+    return exported, skipped, failed
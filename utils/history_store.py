@@ -0,0 +1,320 @@
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from . import api_client
+from .disk_cache import CACHE_DIR, DiskCache
+
+HISTORY_DB_PATH = os.path.join(CACHE_DIR, "history.sqlite3")
+# Largest page the /v1/history endpoint returns
+HISTORY_PAGE_SIZE = 1000
+HISTORY_AUDIO_CACHE_DIR = os.path.join(CACHE_DIR, "history_audio")
+HISTORY_AUDIO_CACHE_MAX_BYTES = int(os.getenv('ELEVENGUI_HISTORY_AUDIO_CACHE_MB', 500)) * 1024 * 1024
+HISTORY_AUDIO_PREFETCH_WORKERS = int(os.getenv('ELEVENGUI_HISTORY_AUDIO_PREFETCH_WORKERS', 2))
+
+_history_audio_cache = None
+_prefetch_pool = None
+_lazy_lock = threading.Lock()
+_downloads = {}  # history_item_id -> Future of a prefetch in progress
+_downloads_lock = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    history_item_id TEXT PRIMARY KEY,
+    voice_id TEXT,
+    voice_name TEXT,
+    text TEXT,
+    date_unix INTEGER,
+    stability REAL,
+    similarity_boost REAL,
+    item TEXT
+);
+CREATE INDEX IF NOT EXISTS history_date ON history (date_unix DESC);
+CREATE INDEX IF NOT EXISTS history_voice ON history (voice_name, date_unix DESC);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Full-text index over the history text, kept in step with the history table by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE history_fts USING fts5(text, content='history', content_rowid='rowid');
+CREATE TRIGGER history_fts_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, text) VALUES (new.rowid, new.text);
+END;
+CREATE TRIGGER history_fts_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+END;
+CREATE TRIGGER history_fts_update AFTER UPDATE OF text ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+    INSERT INTO history_fts (rowid, text) VALUES (new.rowid, new.text);
+END;
+INSERT INTO history_fts (history_fts) VALUES ('rebuild');
+"""
+
+
+def fetch_history_page(api_key, page_size=HISTORY_PAGE_SIZE, start_after_history_item_id=None):
+    # One page of history, newest first. Raises on network or HTTP errors.
+    params = {"page_size": page_size}
+    if start_after_history_item_id:
+        params["start_after_history_item_id"] = start_after_history_item_id
+    response = api_client.get("/v1/history", api_key=api_key, params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_history_audio(api_key, history_item_id):
+    response = api_client.get(f"/v1/history/{history_item_id}/audio", api_key=api_key)
+    response.raise_for_status()
+    return response.content
+
+
+def get_history_audio_cache():
+    # History audio never changes, so each item only has to be downloaded once.
+    # Created on first use, so importing this module creates no directories.
+    global _history_audio_cache
+    if _history_audio_cache is None:
+        with _lazy_lock:
+            if _history_audio_cache is None:
+                _history_audio_cache = DiskCache(HISTORY_AUDIO_CACHE_DIR, HISTORY_AUDIO_CACHE_MAX_BYTES,
+                                                 suffix=".mp3")
+    return _history_audio_cache
+
+
+def _get_prefetch_pool():
+    global _prefetch_pool
+    if _prefetch_pool is None:
+        with _lazy_lock:
+            if _prefetch_pool is None:
+                _prefetch_pool = ThreadPoolExecutor(max_workers=HISTORY_AUDIO_PREFETCH_WORKERS)
+    return _prefetch_pool
+
+
+def history_audio_path(api_key, history_item_id, cache=None):
+    # Path of the item's audio in the cache, downloading it on a miss.
+    # Raises requests.RequestException if the download fails.
+    if cache is None:
+        cache = get_history_audio_cache()
+    path = cache.get_path(history_item_id)
+    if path is not None:
+        return path
+    with _downloads_lock:
+        future = _downloads.get(history_item_id)
+    if future is not None:
+        # Already on its way from a prefetch
+        return future.result()
+    return cache.put(history_item_id, fetch_history_audio(api_key, history_item_id))
+
+
+def _prefetch(api_key, history_item_id, cache):
+    try:
+        return cache.put(history_item_id, fetch_history_audio(api_key, history_item_id))
+    except requests.RequestException as e:
+        print(f"Failed to prefetch history audio {history_item_id}: {e}")
+        raise
+    finally:
+        with _downloads_lock:
+            _downloads.pop(history_item_id, None)
+
+
+def prefetch_history_audio(api_key, history_item_ids, cache=None):
+    # Downloads items that are not cached yet in the background
+    if cache is None:
+        cache = get_history_audio_cache()
+    with _downloads_lock:
+        for history_item_id in history_item_ids:
+            if history_item_id in _downloads or history_item_id in cache:
+                continue
+            _downloads[history_item_id] = _get_prefetch_pool().submit(_prefetch, api_key, history_item_id, cache)
+
+
+class HistoryStore:
+    # Local SQLite copy of the generation history. sync() only downloads
+    # items newer than the newest stored one; an initial download that was
+    # interrupted is resumed from where it stopped (the backfill cursor).
+    # New items of a later sync are written together once the download
+    # reaches a stored item, so an interrupted sync never leaves a gap.
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # One connection is shared by the Tk thread and the sync thread
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        self.has_fts = self._create_fts()
+
+    def _create_fts(self):
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history_fts'").fetchone()
+            if exists:
+                return True
+            try:
+                # The rebuild at the end indexes rows stored before the index existed
+                self._conn.executescript("BEGIN;" + _FTS_SCHEMA + "COMMIT;")
+                return True
+            except sqlite3.OperationalError as e:
+                # SQLite built without FTS5; search falls back to LIKE
+                self._conn.rollback()
+                print(f"Full-text search unavailable: {e}")
+                return False
+
+    def _get_state(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_state(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+
+    def _known_ids(self, history_item_ids):
+        if not history_item_ids:
+            return set()
+        placeholders = ",".join("?" * len(history_item_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT history_item_id FROM history WHERE history_item_id IN ({placeholders})",
+                history_item_ids).fetchall()
+        return {row["history_item_id"] for row in rows}
+
+    def add_items(self, items):
+        rows = []
+        for item in items:
+            settings = item.get("settings") or {}
+            rows.append((item["history_item_id"], item.get("voice_id"), item.get("voice_name"),
+                         item.get("text", ""), item.get("date_unix", 0), settings.get("stability"),
+                         settings.get("similarity_boost"), json.dumps(item)))
+        # An upsert rather than INSERT OR REPLACE, so the index triggers see an update
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO history (history_item_id, voice_id, voice_name, text, date_unix,"
+                " stability, similarity_boost, item) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (history_item_id) DO UPDATE SET voice_id = excluded.voice_id,"
+                " voice_name = excluded.voice_name, text = excluded.text, date_unix = excluded.date_unix,"
+                " stability = excluded.stability, similarity_boost = excluded.similarity_boost,"
+                " item = excluded.item", rows)
+
+    def _oldest_id(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT history_item_id FROM history ORDER BY date_unix ASC LIMIT 1").fetchone()
+        return row["history_item_id"] if row else None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def sync(self, api_key, page_size=HISTORY_PAGE_SIZE):
+        # Returns the number of new items. Raises requests.RequestException on network errors.
+        with self._sync_lock:
+            initial = self.count() == 0
+            backfill_complete = self._get_state("backfill_complete") == "1"
+            new_items = 0
+
+            # Newest items first, until one that is already stored
+            cursor = None
+            staged = []
+            while True:
+                page = fetch_history_page(api_key, page_size, cursor)
+                items = page.get("history", [])
+                known = self._known_ids([item["history_item_id"] for item in items])
+                fresh = [item for item in items if item["history_item_id"] not in known]
+                if initial:
+                    self.add_items(fresh)
+                else:
+                    staged.extend(fresh)
+                new_items += len(fresh)
+                if not page.get("has_more") or not items:
+                    if initial:
+                        self._set_state("backfill_complete", "1")
+                        backfill_complete = True
+                    break
+                if known:
+                    break
+                cursor = page.get("last_history_item_id") or items[-1]["history_item_id"]
+                if initial:
+                    self._set_state("backfill_cursor", cursor)
+            # One transaction: either the whole gap is stored or none of it
+            self.add_items(staged)
+
+            # Resume an initial download that did not reach the oldest item
+            cursor = self._get_state("backfill_cursor") or self._oldest_id()
+            while not backfill_complete and cursor:
+                page = fetch_history_page(api_key, page_size, cursor)
+                items = page.get("history", [])
+                known = self._known_ids([item["history_item_id"] for item in items])
+                fresh = [item for item in items if item["history_item_id"] not in known]
+                self.add_items(fresh)
+                new_items += len(fresh)
+                if not page.get("has_more") or not items:
+                    self._set_state("backfill_complete", "1")
+                    break
+                cursor = page.get("last_history_item_id") or items[-1]["history_item_id"]
+                self._set_state("backfill_cursor", cursor)
+
+            return new_items
+
+    def items(self, voice_name=None):
+        # All stored items, newest first, shaped like the API's history items
+        return self.search(voice_name=voice_name)
+
+    def search(self, text=None, voice_name=None, date_from=None, date_to=None,
+               stability_range=None, similarity_range=None, limit=None):
+        # Items matching every given filter, newest first. Words in `text` all
+        # have to appear, each as a word prefix; dates are unix timestamps
+        # and ranges are (low, high) pairs.
+        where = []
+        params = []
+        words = [word.replace('"', "") for word in (text or "").split()]
+        words = [word for word in words if word]
+        if words and self.has_fts:
+            where.append("rowid IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)")
+            params.append(" ".join(f'"{word}"*' for word in words))
+        else:
+            for word in words:
+                where.append("text LIKE ?")
+                params.append(f"%{word}%")
+        if voice_name is not None:
+            where.append("voice_name = ?")
+            params.append(voice_name)
+        if date_from is not None:
+            where.append("date_unix >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            where.append("date_unix <= ?")
+            params.append(date_to)
+        for column, value_range in (("stability", stability_range), ("similarity_boost", similarity_range)):
+            if value_range is not None:
+                where.append(f"{column} BETWEEN ? AND ?")
+                params.extend(value_range)
+
+        query = ("SELECT history_item_id, voice_id, voice_name, text, date_unix, stability,"
+                 " similarity_boost FROM history")
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY date_unix DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row_to_item(row) for row in rows]
+
+    @staticmethod
+    def _row_to_item(row):
+        settings = {}
+        if row["stability"] is not None:
+            settings["stability"] = row["stability"]
+        if row["similarity_boost"] is not None:
+            settings["similarity_boost"] = row["similarity_boost"]
+        return {"history_item_id": row["history_item_id"], "voice_id": row["voice_id"],
+                "voice_name": row["voice_name"], "text": row["text"],
+                "date_unix": row["date_unix"], "settings": settings}
@@ -0,0 +1,68 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Import-time budget check for the application's startup path.
+#
+#   python -m utils.import_budget [--module main] [--budget-ms 1500] [--top 15]
+#
+# Runs `python -X importtime -c "import <module>"` in a fresh interpreter,
+# prints the most expensive top-level imports and exits with status 1 when
+# the total exceeds the budget or a heavy optional backend is imported
+# eagerly.
+
+IMPORT_BUDGET_MS = float(os.getenv('ELEVENGUI_IMPORT_BUDGET_MS', 1500))
+# These must only be imported on first use
+LAZY_MODULES = ("whisper", "torch", "openai", "numpy", "sounddevice", "soundfile")
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def measure_imports(module):
+    # Returns [(name, depth, self_us, cumulative_us)] in import order
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # the header line
+        name = parts[2][1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(parts[0]), int(parts[1])))
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the import time of the app's startup path.")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    entries = measure_imports(args.module)
+    top_level = sorted((e for e in entries if e[1] == 0), key=lambda e: e[3], reverse=True)
+    total_ms = sum(e[3] for e in top_level) / 1000
+
+    print(f"{'cumulative ms':>14}  module")
+    for name, _, _, cumulative in top_level[:args.top]:
+        print(f"{cumulative / 1000:>14.1f}  {name}")
+    print(f"{total_ms:>14.1f}  total (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    eager = sorted({e[0] for e in entries if e[0].split(".")[0] in LAZY_MODULES})
+    if eager:
+        print(f"Imported eagerly but should be lazy: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"Import time {total_ms:.1f} ms is over the budget of {args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import importlib
+import importlib.util
+import sys
+
+
+class LazyModule:
+    # Stands in for a module and imports it on first attribute access.
+    # importlib.import_module holds the per-module import lock, so two
+    # threads touching the module at once still import it only once.
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def is_available(name):
+    # Checks whether a module can be imported without importing it
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
@@ -0,0 +1,362 @@
+import os
+import sys
+import threading
+from collections import deque
+from .lazy_import import lazy_import
+
+np = lazy_import('numpy')
+sd = lazy_import('sounddevice')
+sf = lazy_import('soundfile')
+
+PLAYBACK_BLOCKSIZE = int(os.getenv('ELEVENGUI_PLAYBACK_BLOCKSIZE', 2048))
+# Decoded audio kept ready ahead of the output
+PLAYBACK_BUFFER_SECONDS = 2
+DECODE_BLOCK_FRAMES = 8192
+
+
+class PlaybackEngine:
+    # Plays a sound file through one output stream without loading it into
+    # memory. A decoder thread reads float32 blocks from the SoundFile into
+    # a preallocated ring buffer; the audio callback only copies from the
+    # ring into the output, so it allocates nothing and memory stays flat
+    # for files of any length. Files of any channel count are played: mono
+    # is copied to every output channel, channels the device lacks are
+    # dropped.
+    #
+    # Tracks can be queued: when the decoder reaches the end of one file it
+    # opens the next and keeps filling the same ring, so consecutive tracks
+    # of the same format play without a gap. Queued sources are paths or
+    # callables returning a path (e.g. downloading the file). A resolver
+    # thread calls the source at the head of the queue while the track
+    # before it plays; the decoder only ever opens paths, so it never blocks
+    # on the network and unload() never waits for a download. When playback
+    # finishes with tracks still queued (one in another format, or one that
+    # was not resolved in time), resolve_next() and then advance() start the
+    # next one on a new stream.
+
+    STOPPED = "stopped"
+    PLAYING = "playing"
+    PAUSED = "paused"
+
+    def __init__(self, blocksize=PLAYBACK_BLOCKSIZE, buffer_seconds=PLAYBACK_BUFFER_SECONDS):
+        self.blocksize = blocksize
+        self.buffer_seconds = buffer_seconds
+        self.state = self.STOPPED
+        self.samplerate = None
+        self.channels = None
+        # Set by the callback once the last frame has been played
+        self.finished = False
+        self._queue = deque()  # sources not opened yet
+        # Guards _queue, which the Tk, decoder and resolver threads all change
+        self._queue_changed = threading.Condition()
+        # Bumped whenever the queue is replaced, so a stale resolve is dropped
+        self._queue_generation = 0
+        self._resolver = None
+        # (start, path, frames) of each opened track still playing; start is a ring position
+        self._tracks = deque()
+        self._file = None
+        self._file_path = None
+        self._stream = None
+        self._ring = None
+        self._write_pos = 0  # total frames decoded into the ring
+        self._read_pos = 0  # total frames copied to the output
+        self._eof = False
+        self._space = threading.Event()
+        self._decoder = None
+        self._stop_decoding = False
+        self._copy_channels = 1
+        self._upmix = False
+
+    def _current_track(self):
+        # Drops tracks the output has moved past
+        while len(self._tracks) > 1 and self._tracks[1][0] <= self._read_pos:
+            self._tracks.popleft()
+        return self._tracks[0] if self._tracks else (0, None, 0)
+
+    @property
+    def path(self):
+        return self._current_track()[1]
+
+    @property
+    def frames(self):
+        return self._current_track()[2]
+
+    @property
+    def frames_played(self):
+        return min(self._read_pos - self._current_track()[0], self.frames)
+
+    @property
+    def duration(self):
+        return self.frames / self.samplerate if self.samplerate else 0
+
+    @property
+    def position(self):
+        return self.frames_played / self.samplerate if self.samplerate else 0
+
+    @property
+    def queued(self):
+        with self._queue_changed:
+            return len(self._queue)
+
+    @property
+    def is_playing(self):
+        return self.state == self.PLAYING and not self.finished
+
+    def load(self, path, queue=()):
+        # The queue is set before decoding starts, so a short first track cannot run out before it
+        self.unload()
+        self._set_queue(queue)
+        self._open(path)
+
+    def _open(self, path):
+        self._file = sf.SoundFile(path)
+        self._file_path = path
+        self.samplerate = self._file.samplerate
+        self.channels = self._file.channels
+        capacity = int(self.buffer_seconds * self.samplerate)
+        if self._ring is None or self._ring.shape != (capacity, self.channels):
+            self._ring = np.zeros((capacity, self.channels), dtype=np.float32)
+        self._open_stream()
+        self._rewind()
+
+    def _output_channels(self):
+        for channels in (self.channels, 2, 1):
+            try:
+                sd.check_output_settings(samplerate=self.samplerate, channels=channels, dtype='float32')
+                return channels
+            except (sd.PortAudioError, ValueError):
+                continue
+        return 1
+
+    def _open_stream(self):
+        channels = self._output_channels()
+        self._copy_channels = min(self.channels, channels)
+        self._upmix = self.channels == 1
+        # The stream is kept open while the format stays the same
+        if self._stream is not None and (self._stream.samplerate, self._stream.channels) == (self.samplerate, channels):
+            return
+        self._close_stream()
+        self._stream = sd.OutputStream(samplerate=self.samplerate, channels=channels, dtype='float32',
+                                       blocksize=self.blocksize, callback=self._callback)
+
+    def _close_stream(self):
+        if self._stream is not None:
+            self._stream.abort()
+            self._stream.close()
+            self._stream = None
+
+    def _copy(self, out, block):
+        if self._upmix:
+            # A (frames, 1) block broadcasts to every output channel
+            out[:] = block
+        else:
+            out[:, :self._copy_channels] = block[:, :self._copy_channels]
+            if out.shape[1] > self._copy_channels:
+                out[:, self._copy_channels:] = 0
+
+    def _callback(self, outdata, frames, time, status):
+        if status:
+            print(status, file=sys.stderr)
+        # Read the end-of-file flag first: once it is set, every frame is in the ring
+        eof = self._eof
+        capacity = len(self._ring)
+        available = self._write_pos - self._read_pos
+        count = min(frames, available)
+        start = self._read_pos % capacity
+        first = min(count, capacity - start)
+        self._copy(outdata[:first], self._ring[start:start + first])
+        if count > first:
+            self._copy(outdata[first:count], self._ring[:count - first])
+        if count < frames:
+            outdata[count:] = 0
+        self._read_pos += count
+        self._space.set()
+        if eof and count == available:
+            self.finished = True
+            raise sd.CallbackStop
+
+    def _decode(self):
+        capacity = len(self._ring)
+        while not self._stop_decoding:
+            self._space.clear()
+            free = capacity - (self._write_pos - self._read_pos)
+            if free < min(DECODE_BLOCK_FRAMES, capacity // 2):
+                self._space.wait(0.1)
+                continue
+            start = self._write_pos % capacity
+            count = min(free, capacity - start, DECODE_BLOCK_FRAMES)
+            read = len(self._file.read(count, dtype='float32', out=self._ring[start:start + count]))
+            self._write_pos += read
+            if read < count and not self._open_next():
+                self._eof = True
+                return
+
+    def _open_next(self):
+        # Continues decoding with the next queued track if it fits the open stream
+        while not self._stop_decoding:
+            with self._queue_changed:
+                if not self._queue:
+                    return False
+                if callable(self._queue[0]):
+                    # Still being resolved; wait briefly so a stop is never held up
+                    self._queue_changed.wait(0.1)
+                    continue
+                path = self._queue.popleft()
+                generation = self._queue_generation
+            try:
+                next_file = sf.SoundFile(path)
+            except Exception as e:
+                print(f"Skipping queued track: {e}", file=sys.stderr)
+                continue
+            if (next_file.samplerate, next_file.channels) != (self.samplerate, self.channels):
+                # Needs a new stream; advance() picks it up after this track
+                next_file.close()
+                with self._queue_changed:
+                    if generation == self._queue_generation:
+                        self._queue.appendleft(path)
+                return False
+            self._file.close()
+            self._file = next_file
+            self._file_path = path
+            self._tracks.append((self._write_pos, path, next_file.frames))
+            return True
+        return False
+
+    def _stop_decoder(self):
+        if self._decoder is not None:
+            self._stop_decoding = True
+            self._space.set()
+            self._decoder.join()
+            self._decoder = None
+
+    def _rewind(self):
+        # Restarts the file decoded last, so a replay after a queue plays its last track
+        self._stop_decoder()
+        self._file.seek(0)
+        self._write_pos = 0
+        self._read_pos = 0
+        self._tracks.clear()
+        self._tracks.append((0, self._file_path, self._file.frames))
+        self._eof = False
+        self.finished = False
+        self._stop_decoding = False
+        self._decoder = threading.Thread(target=self._decode, daemon=True)
+        self._decoder.start()
+
+    def play(self):
+        if self._file is None:
+            return
+        if self.state == self.PAUSED and not self.finished:
+            self.resume()
+            return
+        if self._stream.active or self.finished:
+            # A finished stream has to be stopped before it can start again
+            self._stream.abort()
+            self._rewind()
+        self._stream.start()
+        self.state = self.PLAYING
+
+    def pause(self):
+        if self.state == self.PLAYING:
+            self._stream.stop()
+            self.state = self.PAUSED
+
+    def resume(self):
+        if self.state == self.PAUSED:
+            self._stream.start()
+            self.state = self.PLAYING
+
+    def stop(self):
+        if self._file is None:
+            return
+        self._stream.abort()
+        self._rewind()
+        self.state = self.STOPPED
+
+    def _set_queue(self, sources):
+        with self._queue_changed:
+            self._queue.clear()
+            self._queue.extend(sources)
+            self._queue_generation += 1
+            self._queue_changed.notify_all()
+            self._start_resolver()
+
+    def enqueue(self, sources):
+        with self._queue_changed:
+            self._queue.extend(sources)
+            self._queue_changed.notify_all()
+            self._start_resolver()
+
+    def _start_resolver(self):
+        # Called with _queue_changed held
+        if self._resolver is None and any(callable(source) for source in self._queue):
+            self._resolver = threading.Thread(target=self._resolve, daemon=True)
+            self._resolver.start()
+
+    def _resolve(self):
+        # Resolver thread: turns the source at the head of the queue into a path
+        while True:
+            with self._queue_changed:
+                while not (self._queue and callable(self._queue[0])):
+                    self._queue_changed.wait()
+                source = self._queue[0]
+                generation = self._queue_generation
+            try:
+                path, error = source(), None
+            except Exception as e:
+                path, error = None, e
+            with self._queue_changed:
+                # The queue may have been cleared or replaced during the download
+                if generation == self._queue_generation and self._queue and self._queue[0] is source:
+                    if error is None:
+                        self._queue[0] = path
+                    else:
+                        print(f"Skipping queued track: {error}", file=sys.stderr)
+                        self._queue.popleft()
+                self._queue_changed.notify_all()
+
+    def resolve_next(self):
+        # Waits until the next queued track is resolved and returns its path,
+        # or None if nothing is queued. This may wait for a download, so call
+        # it off the Tk thread before advance().
+        with self._queue_changed:
+            while self._queue and callable(self._queue[0]):
+                self._queue_changed.wait()
+            return self._queue[0] if self._queue else None
+
+    def advance(self):
+        # Starts the next queued track after playback finished; returns False
+        # if there is none or it is not resolved yet
+        while True:
+            with self._queue_changed:
+                if not self._queue or callable(self._queue[0]):
+                    return False
+                path = self._queue.popleft()
+            try:
+                self.unload()
+                self._open(path)
+            except Exception as e:
+                print(f"Skipping queued track: {e}", file=sys.stderr)
+                continue
+            self.play()
+            return True
+
+    def clear_queue(self):
+        self._set_queue(())
+
+    def unload(self):
+        self._stop_decoder()
+        if self._stream is not None:
+            self._stream.abort()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._tracks.clear()
+        self._read_pos = 0
+        self._write_pos = 0
+        self.finished = False
+        self.state = self.STOPPED
+
+    def close(self):
+        self.unload()
+        self._close_stream()
@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import requests
+from . import api_client
+from .disk_cache import DiskCache, cache_key
+from .lazy_import import lazy_import
+
+sf = lazy_import('soundfile')
+
+PREVIEW_MEMORY_MAX_BYTES = int(os.getenv('ELEVENGUI_PREVIEW_MEMORY_MB', 64)) * 1024 * 1024
+PREVIEW_DISK_MAX_BYTES = int(os.getenv('ELEVENGUI_PREVIEW_DISK_MB', 200)) * 1024 * 1024
+PREVIEW_WORKERS = int(os.getenv('ELEVENGUI_PREVIEW_WORKERS', 2))
+PREVIEW_PREFETCH_WORKERS = int(os.getenv('ELEVENGUI_PREVIEW_PREFETCH_WORKERS', 1))
+
+
+class PreviewCache:
+    # Two-level cache for voice previews: decoded float32 audio in memory
+    # (LRU, capped by size) on top of the compressed preview files on disk.
+    # Downloads and decoding run on a small shared pool instead of one
+    # thread per click. Prefetches have a pool of their own, so a click never
+    # waits behind them; one that has not started yet is cancelled when the
+    # same preview is clicked.
+
+    def __init__(self, directory, max_memory_bytes=PREVIEW_MEMORY_MAX_BYTES,
+                 max_disk_bytes=PREVIEW_DISK_MAX_BYTES, workers=PREVIEW_WORKERS,
+                 prefetch_workers=PREVIEW_PREFETCH_WORKERS):
+        self.disk = DiskCache(directory, max_disk_bytes, suffix=".mp3")
+        self.max_memory_bytes = max_memory_bytes
+        self.memory_bytes = 0
+        self._memory = OrderedDict()  # preview_url -> (data, samplerate)
+        self._pending = {}  # preview_url -> Future
+        # Reentrant: cancelling a prefetch under the lock runs its done callback right away
+        self._lock = threading.RLock()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=prefetch_workers)
+
+    def get_decoded(self, preview_url):
+        with self._lock:
+            audio = self._memory.get(preview_url)
+            if audio is not None:
+                self._memory.move_to_end(preview_url)
+            return audio
+
+    def _remember(self, preview_url, audio):
+        with self._lock:
+            if preview_url in self._memory:
+                return
+            self._memory[preview_url] = audio
+            self.memory_bytes += audio[0].nbytes
+            while self.memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, (data, _) = self._memory.popitem(last=False)
+                self.memory_bytes -= data.nbytes
+
+    def _download(self, preview_url):
+        key = cache_key(preview_url)
+        data = self.disk.get(key)
+        if data is None:
+            response = api_client.get(preview_url)
+            response.raise_for_status()
+            data = response.content
+            self.disk.put(key, data)
+        return data
+
+    def _load(self, preview_url):
+        audio = self.get_decoded(preview_url)
+        if audio is None:
+            data, samplerate = sf.read(BytesIO(self._download(preview_url)), dtype='float32')
+            audio = (data, samplerate)
+            self._remember(preview_url, audio)
+        return audio
+
+    def _submit(self, preview_url, task, pool):
+        # Only one download per preview is ever in flight
+        with self._lock:
+            future = self._pending.get(preview_url)
+            if future is not None and not (pool is self._pool and future.cancel()):
+                return future
+            future = pool.submit(task, preview_url)
+            self._pending[preview_url] = future
+        # Registered outside the lock: a finished future runs the callback right away
+        future.add_done_callback(lambda done: self._done(preview_url, done))
+        return future
+
+    def _done(self, preview_url, future):
+        with self._lock:
+            if self._pending.get(preview_url) is future:
+                del self._pending[preview_url]
+
+    def request(self, preview_url, callback=None):
+        # Calls callback((data, samplerate)) as soon as the preview is available
+        audio = self.get_decoded(preview_url)
+        if audio is not None:
+            if callback:
+                callback(audio)
+            return
+
+        def on_loaded(future):
+            try:
+                audio = future.result()
+            except (requests.RequestException, RuntimeError, OSError) as e:
+                print(f"Unable to load the voice preview: {e}")
+                return
+            if not isinstance(audio, tuple):
+                # Joined a prefetch, which only downloads; decode from disk now
+                self.request(preview_url, callback)
+            elif callback:
+                callback(audio)
+
+        self._submit(preview_url, self._load, self._pool).add_done_callback(on_loaded)
+
+    def prefetch(self, preview_urls):
+        # Warms the disk store only; decoding happens when a preview is requested
+        for preview_url in preview_urls:
+            if preview_url and cache_key(preview_url) not in self.disk:
+                self._submit(preview_url, self._download, self._prefetch_pool)
@@ -0,0 +1,92 @@
+import os
+import threading
+import requests
+from . import api_client
+
+QUOTA_RECONCILE_SECONDS = int(os.getenv('ELEVENGUI_QUOTA_RECONCILE_SECONDS', 300))
+# A job that would leave less than this share of the limit gets a warning
+QUOTA_WARN_FRACTION = float(os.getenv('ELEVENGUI_QUOTA_WARN_FRACTION', 0.1))
+
+
+def fetch_quota(api_key):
+    # Returns (characters used, character limit), or None if the request fails
+    try:
+        response = api_client.get("/v1/user", api_key=api_key)
+        if response.status_code == 200:
+            data = response.json()
+            return data['subscription']['character_count'], data['subscription']['character_limit']
+        else:
+            print("Error updating quota.")
+    except requests.RequestException:
+        print("Unable to connect to ElevenLabs API. Please check your internet connection.")
+    return None
+
+
+class QuotaTracker:
+    # Keeps the character quota without a request per generation: record()
+    # adds the characters a generation was billed for, and reconcile(),
+    # which the caller runs every reconcile_seconds off the Tk thread,
+    # replaces the local count with the account's. on_change(used, limit)
+    # is called on whichever thread changed the count.
+
+    OK = "ok"
+    WARN = "warn"
+    BLOCK = "block"
+
+    def __init__(self, api_key, on_change=None, reconcile_seconds=QUOTA_RECONCILE_SECONDS,
+                 warn_fraction=QUOTA_WARN_FRACTION):
+        self.api_key = api_key
+        self.on_change = on_change
+        self.reconcile_seconds = reconcile_seconds
+        self.warn_fraction = warn_fraction
+        self.used = None
+        self.limit = None
+        # Characters recorded before the quota was first loaded
+        self._pending_usage = 0
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        with self._lock:
+            if self.used is None:
+                return None
+            return max(self.limit - self.used, 0)
+
+    def _changed(self):
+        if self.on_change and self.used is not None:
+            self.on_change(self.used, self.limit)
+
+    def record(self, characters):
+        if not characters:
+            return
+        with self._lock:
+            if self.used is None:
+                self._pending_usage += characters
+                return
+            self.used += characters
+        self._changed()
+
+    def reconcile(self):
+        # Returns False if the account could not be reached
+        quota = fetch_quota(self.api_key)
+        if quota is None:
+            return False
+        with self._lock:
+            first_load = self.used is None
+            self.used, self.limit = quota
+            if first_load:
+                self.used += self._pending_usage
+                self._pending_usage = 0
+        self._changed()
+        return True
+
+    def check(self, characters):
+        # Pre-flight check for a job billed `characters`: returns (status, message).
+        # While the quota is unknown nothing is blocked.
+        remaining = self.remaining()
+        if remaining is None or not characters:
+            return self.OK, None
+        if characters > remaining:
+            return self.BLOCK, f"Needs {characters} credits, {remaining} left"
+        if remaining - characters < self.limit * self.warn_fraction:
+            return self.WARN, f"Leaves {remaining - characters} of {self.limit} credits"
+        return self.OK, None
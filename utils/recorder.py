@@ -0,0 +1,111 @@
+import os
+import sys
+import threading
+from .lazy_import import lazy_import
+
+np = lazy_import('numpy')
+sd = lazy_import('sounddevice')
+sf = lazy_import('soundfile')
+
+RECORD_SAMPLERATE = 44100
+RECORD_CHANNELS = 2
+# Speech-to-text only needs 16 kHz mono, a twelfth of the data of 44.1 kHz stereo
+SPEECH_SAMPLERATE = 16000
+# Off by default: recordings keep the original 44.1 kHz stereo format unless this is set
+RECORD_FOR_SPEECH = os.getenv('ELEVENGUI_RECORD_FOR_SPEECH', '0') == '1'
+RING_SECONDS = 10
+
+
+class StreamingRecorder:
+    # Records straight to a sound file. The audio callback only copies each
+    # block into a preallocated ring buffer; a writer thread drains the ring
+    # into the file, so memory use does not grow with the recording length.
+    # block_listener(block, samplerate) is called on the writer thread with
+    # a view into the ring, which it must copy if it keeps it.
+
+    def __init__(self, path, speech_mode=RECORD_FOR_SPEECH, ring_seconds=RING_SECONDS, block_listener=None):
+        self.path = path
+        self.speech_mode = speech_mode
+        self.ring_seconds = ring_seconds
+        self.block_listener = block_listener
+        self.samplerate = None
+        self.channels = None
+        self.dropped_frames = 0
+        self._ring = None
+        self._write_pos = 0  # total frames put into the ring by the callback
+        self._read_pos = 0  # total frames written to the file
+        self._data_ready = threading.Event()
+        self._stopping = False
+        self._file = None
+        self._stream = None
+        self._writer = None
+
+    def _choose_format(self):
+        if self.speech_mode:
+            try:
+                sd.check_input_settings(samplerate=SPEECH_SAMPLERATE, channels=1, dtype='float32')
+                return SPEECH_SAMPLERATE, 1, 'PCM_16'
+            except sd.PortAudioError:
+                print("The input device does not support 16 kHz mono, recording at 44.1 kHz stereo")
+        return RECORD_SAMPLERATE, RECORD_CHANNELS, 'PCM_24'
+
+    def start(self):
+        self.samplerate, self.channels, subtype = self._choose_format()
+        self._ring = np.zeros((int(self.ring_seconds * self.samplerate), self.channels), dtype=np.float32)
+        self._file = sf.SoundFile(self.path, mode='w', samplerate=self.samplerate,
+                                  channels=self.channels, subtype=subtype)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+        self._stream = sd.InputStream(samplerate=self.samplerate, channels=self.channels,
+                                      dtype='float32', callback=self._callback)
+        self._stream.start()
+
+    def _callback(self, indata, frames, time, status):
+        if status:
+            print(status, file=sys.stderr)
+        capacity = len(self._ring)
+        free = capacity - (self._write_pos - self._read_pos)
+        if frames > free:
+            # The writer fell a whole ring behind; drop rather than block the audio thread
+            self.dropped_frames += frames - free
+            frames = free
+        start = self._write_pos % capacity
+        first = min(frames, capacity - start)
+        self._ring[start:start + first] = indata[:first]
+        if frames > first:
+            self._ring[:frames - first] = indata[first:frames]
+        self._write_pos += frames
+        self._data_ready.set()
+
+    def _drain(self):
+        capacity = len(self._ring)
+        available = self._write_pos - self._read_pos
+        while available > 0:
+            start = self._read_pos % capacity
+            count = min(available, capacity - start)
+            block = self._ring[start:start + count]
+            self._file.write(block)
+            if self.block_listener:
+                self.block_listener(block, self.samplerate)
+            self._read_pos += count
+            available -= count
+
+    def _write_loop(self):
+        while True:
+            self._data_ready.wait(0.1)
+            self._data_ready.clear()
+            self._drain()
+            if self._stopping and self._read_pos == self._write_pos:
+                break
+
+    def stop(self):
+        # Returns the path of the finished recording
+        self._stream.stop()
+        self._stream.close()
+        self._stopping = True
+        self._data_ready.set()
+        self._writer.join()
+        self._file.close()
+        if self.dropped_frames:
+            print(f"Recording dropped {self.dropped_frames} frames", file=sys.stderr)
+        return self.path
@@ -0,0 +1,343 @@
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from . import api_client
+from .disk_cache import CACHE_DIR, DiskCache, cache_key
+from .lazy_import import lazy_import
+
+np = lazy_import('numpy')
+sd = lazy_import('sounddevice')
+sf = lazy_import('soundfile')
+
+# No model_id is sent unless one is chosen, so the API picks its default model
+DEFAULT_MODEL_ID = None
+DEFAULT_OUTPUT_FORMAT = "mp3_44100_128"
+
+# Raw 16-bit PCM can be decoded block by block as it arrives, unlike MP3
+STREAM_OUTPUT_FORMAT = "pcm_24000"
+STREAM_CHUNK_SIZE = 4096
+
+# Long-form text is split into requests below the per-request character limit
+MAX_REQUEST_CHARS = 5000
+LONG_FORM_CHAR_LIMIT = int(os.getenv('ELEVENGUI_LONG_FORM_CHAR_LIMIT', 100000))
+LONG_FORM_WORKERS = int(os.getenv('ELEVENGUI_LONG_FORM_WORKERS', 3))
+# Silence at the joins between chunks is trimmed down to this much padding
+SILENCE_THRESHOLD = 0.01
+JOIN_PADDING_SECONDS = 0.15
+
+SPEECH_CACHE_MAX_BYTES = int(os.getenv('ELEVENGUI_SPEECH_CACHE_MB', 500)) * 1024 * 1024
+_speech_cache = None
+_speech_cache_lock = threading.Lock()
+
+
+def _output_file_mode():
+    # mkstemp() creates 0600 files; written outputs get the mode open() would give them
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# Read once at import, since os.umask() briefly changes it for every thread
+OUTPUT_FILE_MODE = _output_file_mode()
+
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+class SynthesisError(Exception):
+    pass
+
+
+def get_speech_cache():
+    # Created on first use, so importing this module creates no directories
+    global _speech_cache
+    if _speech_cache is None:
+        with _speech_cache_lock:
+            if _speech_cache is None:
+                _speech_cache = DiskCache(os.path.join(CACHE_DIR, "speech"), SPEECH_CACHE_MAX_BYTES)
+    return _speech_cache
+
+
+def build_request_body(text, stability, similarity_boost, model_id=DEFAULT_MODEL_ID):
+    request_body = {
+        "text": text,
+        "voice_settings": {
+            "stability": stability,
+            "similarity_boost": similarity_boost
+        }
+    }
+    if model_id:
+        request_body["model_id"] = model_id
+    return request_body
+
+
+def speech_cache_key(voice_id, request_body, output_format):
+    settings = request_body.get("voice_settings", {})
+    return cache_key(voice_id, request_body.get("model_id", "default"), request_body["text"],
+                     settings.get("stability"), settings.get("similarity_boost"), output_format)
+
+
+def pcm_samplerate(output_format):
+    # "pcm_24000" -> 24000
+    return int(output_format.split("_")[1])
+
+
+def pcm_to_float32(data):
+    return np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+
+
+def stream_speech(api_key, voice_id, request_body, output_format=STREAM_OUTPUT_FORMAT,
+                  chunk_size=STREAM_CHUNK_SIZE):
+    # Generator over the raw audio bytes of the /stream endpoint
+    response = api_client.post(f"/v1/text-to-speech/{voice_id}/stream", api_key=api_key,
+                               params={"output_format": output_format},
+                               json=request_body, stream=True)
+    with response:
+        if response.status_code != 200:
+            raise SynthesisError(
+                f"Text-to-speech streaming failed with status {response.status_code}")
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if chunk:
+                yield chunk
+
+
+def play_pcm_stream(chunks, samplerate, on_first_audio=None):
+    # Plays 16-bit mono PCM chunks while they are still downloading and returns
+    # all bytes received. The network is read on its own thread so a full
+    # output buffer never stalls the download.
+    start_time = time.perf_counter()
+    blocks = queue.Queue()
+    received = bytearray()
+
+    def read_chunks():
+        remainder = b""
+        try:
+            for chunk in chunks:
+                received.extend(chunk)
+                data = remainder + chunk
+                # Keep an odd trailing byte until the rest of its sample arrives
+                usable = len(data) - (len(data) % 2)
+                remainder = data[usable:]
+                if usable:
+                    blocks.put(pcm_to_float32(data[:usable]))
+        except Exception as e:
+            blocks.put(e)
+        blocks.put(None)
+
+    reader = threading.Thread(target=read_chunks, daemon=True)
+    reader.start()
+
+    first_block = True
+    with sd.OutputStream(samplerate=samplerate, channels=1, dtype='float32') as stream:
+        while True:
+            block = blocks.get()
+            if block is None:
+                break
+            if isinstance(block, Exception):
+                raise block
+            if first_block:
+                first_block = False
+                if on_first_audio:
+                    on_first_audio(time.perf_counter() - start_time)
+            stream.write(block.reshape(-1, 1))
+
+    reader.join()
+    return bytes(received)
+
+
+def _split_words(sentence, limit):
+    parts = []
+    current = ""
+    for word in sentence.split():
+        # A single word longer than the limit has to be cut
+        while len(word) > limit:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(word[:limit])
+            word = word[limit:]
+        if current and len(current) + 1 + len(word) > limit:
+            parts.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        parts.append(current)
+    return parts
+
+
+# Memoized per paragraph: while editing a long text only the paragraph being typed in changes
+@lru_cache(maxsize=4096)
+def _split_paragraph(paragraph, limit):
+    if len(paragraph) <= limit:
+        return (paragraph,)
+    pieces = []
+    for sentence in _SENTENCE_RE.split(paragraph):
+        if len(sentence) <= limit:
+            pieces.append(sentence)
+        else:
+            pieces.extend(_split_words(sentence, limit))
+    return tuple(pieces)
+
+
+def split_text(text, limit=MAX_REQUEST_CHARS):
+    # Packs whole paragraphs, then sentences, then words into chunks of at most `limit` characters
+    chunks = []
+    current = ""
+    for paragraph in _PARAGRAPH_RE.split(text.strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        separator = "\n\n"
+        for piece in _split_paragraph(paragraph, limit):
+            if current and len(current) + len(separator) + len(piece) <= limit:
+                current += separator + piece
+            else:
+                if current:
+                    chunks.append(current)
+                current = piece
+            separator = " "
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def estimate_cost(text, long_form=False):
+    # (requests, characters billed) for generating the text; one character is one credit
+    if not text.strip():
+        return 0, 0
+    if not long_form:
+        return 1, len(text)
+    chunks = split_text(text)
+    return len(chunks), sum(len(chunk) for chunk in chunks)
+
+
+def billable_characters(voice_id, request_body, output_format, long_form=False, cache=None):
+    # Characters a generation would be billed for; audio already in the cache costs nothing
+    if cache is None:
+        cache = get_speech_cache()
+    text = request_body["text"]
+    chunks = split_text(text) if long_form else [text]
+    return sum(len(chunk) for chunk in chunks
+               if speech_cache_key(voice_id, dict(request_body, text=chunk), output_format) not in cache)
+
+
+def request_speech(api_key, voice_id, request_body, output_format=None):
+    params = {"output_format": output_format} if output_format else None
+    response = api_client.post(f"/v1/text-to-speech/{voice_id}", api_key=api_key,
+                               params=params, json=request_body)
+    if response.status_code != 200:
+        raise SynthesisError(
+            f"Text-to-speech request failed with status {response.status_code}")
+    return response.content
+
+
+def fetch_speech(api_key, voice_id, request_body, output_format=DEFAULT_OUTPUT_FORMAT,
+                 cache=None):
+    # Returns (audio bytes, True if they came from the cache). Cache hits make
+    # no API call. The shared speech cache is used unless another is given.
+    if cache is None:
+        cache = get_speech_cache()
+    key = speech_cache_key(voice_id, request_body, output_format)
+    audio = cache.get(key)
+    if audio is not None:
+        return audio, True
+    audio = request_speech(api_key, voice_id, request_body, output_format)
+    cache.put(key, audio)
+    return audio, False
+
+
+def trim_silence(audio, samplerate, leading=True, trailing=True,
+                 threshold=SILENCE_THRESHOLD, padding=JOIN_PADDING_SECONDS):
+    loud = np.flatnonzero(np.abs(audio) > threshold)
+    if loud.size == 0:
+        return audio[:0]
+    pad = int(padding * samplerate)
+    start = max(loud[0] - pad, 0) if leading else 0
+    stop = min(loud[-1] + 1 + pad, len(audio)) if trailing else len(audio)
+    return audio[start:stop]
+
+
+def synthesize_long_form(api_key, voice_id, request_body, output_format=STREAM_OUTPUT_FORMAT,
+                         max_workers=LONG_FORM_WORKERS, on_chunk=None, chunks=None):
+    # Generator yielding the decoded audio of each chunk in text order. All
+    # chunks are requested up front on a bounded pool, so later chunks keep
+    # generating while the earlier ones are being played. on_chunk(text, from_cache)
+    # is called for every chunk as it is consumed. The text is split with
+    # split_text() unless the chunks are given.
+    if chunks is None:
+        chunks = split_text(request_body["text"])
+    samplerate = pcm_samplerate(output_format)
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [pool.submit(fetch_speech, api_key, voice_id, dict(request_body, text=chunk),
+                           output_format) for chunk in chunks]
+    try:
+        for index, future in enumerate(futures):
+            data, from_cache = future.result()
+            if on_chunk:
+                on_chunk(chunks[index], from_cache)
+            audio = pcm_to_float32(data)
+            yield trim_silence(audio, samplerate, leading=index > 0,
+                               trailing=index < len(futures) - 1)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def file_chunks(text):
+    # Text that fits one request is sent unchanged, so it shares its cache
+    # entry with the same text generated in the GUI
+    return [text] if len(text) <= MAX_REQUEST_CHARS else split_text(text)
+
+
+def synthesize_to_file(api_key, voice_id, request_body, path, on_chunk=None):
+    # Writes the speech for request_body to path without touching the GUI.
+    # Text longer than one request is split like long-form text: a .wav path
+    # gets the chunks joined with their silence trimmed, any other path gets
+    # the mp3 chunks back to back. The file only appears once it is complete.
+    # on_chunk(text, from_cache) is called for every chunk.
+    chunks = file_chunks(request_body["text"])
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if path.lower().endswith(".wav"):
+                blocks = list(synthesize_long_form(api_key, voice_id, request_body, STREAM_OUTPUT_FORMAT,
+                                                   max_workers=1, on_chunk=on_chunk, chunks=chunks))
+                audio = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+                sf.write(f, audio, pcm_samplerate(STREAM_OUTPUT_FORMAT), format="WAV", subtype="PCM_16")
+            else:
+                for chunk in chunks:
+                    data, from_cache = fetch_speech(api_key, voice_id, dict(request_body, text=chunk),
+                                                    DEFAULT_OUTPUT_FORMAT)
+                    if on_chunk:
+                        on_chunk(chunk, from_cache)
+                    f.write(data)
+        os.chmod(temp_path, OUTPUT_FILE_MODE)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def play_audio_blocks(blocks, samplerate, on_first_audio=None):
+    # Plays mono float32 blocks back to back and returns them stitched into one buffer
+    start_time = time.perf_counter()
+    parts = []
+    with sd.OutputStream(samplerate=samplerate, channels=1, dtype='float32') as stream:
+        for block in blocks:
+            if not parts and on_first_audio:
+                on_first_audio(time.perf_counter() - start_time)
+            parts.append(block)
+            stream.write(block.reshape(-1, 1))
+    if not parts:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(parts)
@@ -0,0 +1,42 @@
+TEXT_ANALYSIS_DELAY_MS = 300
+
+
+class TextModel:
+    # Follows a CTkTextbox through Tk's <<Modified>> event, which fires for
+    # typing, pasting and programmatic inserts alike. On every change only
+    # the length is read, counted inside Tk without copying the buffer;
+    # the heavier analysis that needs the text itself runs once changes
+    # pause for delay_ms. on_length(length) and on_analysis(text) are
+    # called on the Tk thread.
+
+    def __init__(self, text_box, on_length=None, on_analysis=None, delay_ms=TEXT_ANALYSIS_DELAY_MS):
+        self._text = text_box._textbox
+        self.on_length = on_length
+        self.on_analysis = on_analysis
+        self.delay_ms = delay_ms
+        self.length = 0
+        self._job = None
+        self._text.bind("<<Modified>>", self._on_modified, add=True)
+
+    def _on_modified(self, event=None):
+        # Resetting the flag fires the event again; that one carries no change
+        if not self._text.edit_modified():
+            return
+        self._text.edit_modified(False)
+        self.refresh()
+
+    def refresh(self):
+        count = self._text.count("1.0", "end-1c", "chars")
+        if isinstance(count, tuple):
+            count = count[0]
+        self.length = count or 0
+        if self.on_length:
+            self.on_length(self.length)
+        if self._job:
+            self._text.after_cancel(self._job)
+        self._job = self._text.after(self.delay_ms, self._analyze)
+
+    def _analyze(self):
+        self._job = None
+        if self.on_analysis:
+            self.on_analysis(self._text.get("1.0", "end-1c"))
@@ -0,0 +1,68 @@
+import os
+
+UI_MAX_FPS = int(os.getenv('ELEVENGUI_UI_FPS', 30))
+
+
+class TickScheduler:
+    # The one timer behind everything that animates in the window. Each
+    # subscriber is called once per tick and returns True while it still has
+    # something to animate; widget updates posted with set()/configure() are
+    # merged per widget and applied once per tick, and only if they change
+    # what the widget shows. With no subscribers and nothing pending no
+    # timer is scheduled at all.
+
+    def __init__(self, root, max_fps=UI_MAX_FPS):
+        self.root = root
+        self.interval_ms = max(int(1000 / max_fps), 1)
+        self._subscribers = {}  # key -> callback
+        self._pending = {}  # (widget, method) -> value
+        self._job = None
+
+    def subscribe(self, key, callback):
+        # Subscribing under a key that is already ticking replaces it, so a loop is never started twice
+        self._subscribers[key] = callback
+        self._wake()
+
+    def unsubscribe(self, key):
+        self._subscribers.pop(key, None)
+
+    def set(self, widget, value):
+        # For widgets with a set() method, such as sliders and progress bars
+        self._pending[(widget, "set")] = value
+        self._wake()
+
+    def configure(self, widget, **options):
+        self._pending.setdefault((widget, "configure"), {}).update(options)
+        self._wake()
+
+    def _wake(self):
+        if self._job is None:
+            self._job = self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        self._job = None
+        for key, callback in list(self._subscribers.items()):
+            try:
+                animating = callback()
+            except Exception as e:
+                print(f"Tick subscriber {key} failed: {e}")
+                animating = False
+            if not animating and self._subscribers.get(key) is callback:
+                del self._subscribers[key]
+
+        pending, self._pending = self._pending, {}
+        for (widget, method), value in pending.items():
+            try:
+                if method == "configure":
+                    changed = {option: option_value for option, option_value in value.items()
+                               if widget.cget(option) != option_value}
+                    if changed:
+                        widget.configure(**changed)
+                elif widget.get() != value:
+                    widget.set(value)
+            except Exception as e:
+                # The widget may have been destroyed since the update was posted
+                print(f"UI update failed: {e}")
+
+        if self._subscribers or self._pending:
+            self._wake()
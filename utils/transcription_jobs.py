@@ -0,0 +1,148 @@
+import itertools
+import os
+import queue
+import threading
+import traceback
+from collections import namedtuple
+
+TRANSCRIPTION_WORKERS = int(os.getenv('ELEVENGUI_TRANSCRIPTION_WORKERS', 2))
+
+
+class TranscriptionJob:
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, job_id, audio_file, backend, label=None, delete_file=False):
+        self.id = job_id
+        self.audio_file = audio_file
+        self.backend = backend
+        self.label = label or os.path.basename(audio_file)
+        self.delete_file = delete_file
+        self.status = self.QUEUED
+        # None while the backend cannot report progress, else 0..1
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED, self.CANCELLED)
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def snapshot(self):
+        return JobUpdate(self.id, self.label, self.status, self.progress, self.result, self.error)
+
+
+class JobUpdate(namedtuple("JobUpdate", "id label status progress result error")):
+    # An immutable copy of a job's state, so an update handled later still
+    # shows the state the job had when it was posted
+    __slots__ = ()
+
+    @property
+    def finished(self):
+        return self.status in (TranscriptionJob.DONE, TranscriptionJob.FAILED, TranscriptionJob.CANCELLED)
+
+
+class TranscriptionQueue:
+    # Runs transcriptions on worker threads so the Tk loop never blocks.
+    # transcribe(job) does the work and may update job.progress and check
+    # job.cancelled; on_update(update) is called with a JobUpdate snapshot
+    # whenever a job changes state, from whichever thread changed it.
+
+    def __init__(self, transcribe, on_update=None, workers=TRANSCRIPTION_WORKERS):
+        self.transcribe = transcribe
+        self.on_update = on_update
+        self.workers = workers
+        self._jobs = queue.Queue()
+        self._ids = itertools.count(1)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._pending = {}  # job id -> job not finished yet
+
+    def submit(self, audio_file, backend, label=None, delete_file=False):
+        job = TranscriptionJob(next(self._ids), audio_file, backend, label, delete_file)
+        with self._lock:
+            self._pending[job.id] = job
+        self._jobs.put(job)
+        self._start_workers()
+        self._notify(job)
+        return job
+
+    def cancel(self, job_id):
+        # A queued job is cancelled right away; a running one once transcribe() returns
+        with self._lock:
+            job = self._pending.get(job_id)
+            if job is None:
+                return
+            job.cancel()
+            queued = job.status == TranscriptionJob.QUEUED
+            if queued:
+                job.status = TranscriptionJob.CANCELLED
+                del self._pending[job_id]
+        if queued:
+            self._notify(job)
+
+    def report_progress(self, job, progress):
+        # For transcribe() to report how far a running job is (0..1)
+        job.progress = progress
+        self._notify(job)
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _notify(self, job):
+        if self.on_update:
+            self.on_update(job.snapshot())
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            with self._lock:
+                cancelled_while_queued = job.status == TranscriptionJob.CANCELLED
+                if not cancelled_while_queued:
+                    job.status = TranscriptionJob.RUNNING
+            if cancelled_while_queued:
+                # cancel() has already reported it
+                self._delete_file(job)
+                continue
+            if not job.cancelled:
+                job.progress = None
+                self._notify(job)
+                try:
+                    job.result = self.transcribe(job)
+                    job.status = TranscriptionJob.DONE
+                    job.progress = 1.0
+                except Exception as e:
+                    traceback.print_exc()
+                    job.error = e
+                    job.status = TranscriptionJob.FAILED
+            # A job cancelled while running finishes, but its result is dropped
+            with self._lock:
+                if job.cancelled:
+                    job.status = TranscriptionJob.CANCELLED
+                    job.result = None
+                self._pending.pop(job.id, None)
+            self._delete_file(job)
+            self._notify(job)
+
+    @staticmethod
+    def _delete_file(job):
+        if job.delete_file:
+            try:
+                os.remove(job.audio_file)
+            except OSError:
+                pass
@@ -0,0 +1,103 @@
+from collections import deque
+from .lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+FRAME_SECONDS = 0.03
+# RMS level below which a frame always counts as silence
+ENERGY_THRESHOLD = 0.01
+# Noise is detected as a high zero-crossing rate without much energy
+MAX_NOISE_ZCR = 0.35
+MIN_SILENCE_SECONDS = 0.6
+MIN_SPEECH_SECONDS = 0.25
+MAX_SEGMENT_SECONDS = 30
+PRE_ROLL_SECONDS = 0.2
+
+
+def frame_features(frames):
+    # frames has shape (count, frame_length); returns per-frame RMS and zero-crossing rate
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frames.shape[1]
+    return rms, zcr
+
+
+class VoiceActivitySegmenter:
+    # Splits a live audio stream into speech segments. Each block fed in is
+    # cut into short frames whose energy and zero-crossing rate are computed
+    # in one vectorized pass; a segment is closed after a pause and passed
+    # to on_segment(audio) as mono float32.
+
+    def __init__(self, samplerate, on_segment, energy_threshold=ENERGY_THRESHOLD,
+                 min_silence_seconds=MIN_SILENCE_SECONDS, min_speech_seconds=MIN_SPEECH_SECONDS,
+                 max_segment_seconds=MAX_SEGMENT_SECONDS, pre_roll_seconds=PRE_ROLL_SECONDS):
+        self.samplerate = samplerate
+        self.on_segment = on_segment
+        self.energy_threshold = energy_threshold
+        self.frame_length = int(FRAME_SECONDS * samplerate)
+        self.min_silence_frames = int(min_silence_seconds / FRAME_SECONDS)
+        self.min_speech_frames = int(min_speech_seconds / FRAME_SECONDS)
+        self.max_segment_frames = int(max_segment_seconds / FRAME_SECONDS)
+        self.noise_floor = energy_threshold / 2
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._pre_roll = deque(maxlen=max(int(pre_roll_seconds / FRAME_SECONDS), 1))
+        self._segment = []
+        self._speech_frames = 0
+        self._silence_run = 0
+
+    def is_speech(self, rms, zcr):
+        # Adapts to the room: speech has to stand clearly above the noise floor
+        threshold = np.maximum(self.energy_threshold, self.noise_floor * 3)
+        return (rms > threshold) & ((zcr < MAX_NOISE_ZCR) | (rms > threshold * 3))
+
+    def feed(self, block):
+        mono = block.mean(axis=1) if block.ndim > 1 else block
+        data = np.concatenate((self._pending, mono.astype(np.float32, copy=False)))
+        count = len(data) // self.frame_length
+        self._pending = data[count * self.frame_length:].copy()
+        if count == 0:
+            return
+        frames = data[:count * self.frame_length].reshape(count, self.frame_length)
+        rms, zcr = frame_features(frames)
+        speech = self.is_speech(rms, zcr)
+        quiet = rms[~speech]
+        if quiet.size:
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * float(np.median(quiet))
+        for frame, is_speech in zip(frames, speech):
+            self._step(frame, is_speech)
+
+    def _step(self, frame, is_speech):
+        if not self._segment:
+            if is_speech:
+                self._segment = list(self._pre_roll)
+                self._pre_roll.clear()
+                self._segment.append(frame)
+                self._speech_frames = 1
+                self._silence_run = 0
+            else:
+                self._pre_roll.append(frame)
+            return
+        self._segment.append(frame)
+        if is_speech:
+            self._speech_frames += 1
+            self._silence_run = 0
+        else:
+            self._silence_run += 1
+        if self._silence_run >= self.min_silence_frames or len(self._segment) >= self.max_segment_frames:
+            self._close()
+
+    def _close(self):
+        segment = self._segment
+        # Drop most of the trailing pause but keep a little room after the last word
+        keep = len(segment) - max(self._silence_run - self._pre_roll.maxlen, 0)
+        enough_speech = self._speech_frames >= self.min_speech_frames
+        self._segment = []
+        self._speech_frames = 0
+        self._silence_run = 0
+        if enough_speech:
+            self.on_segment(np.concatenate(segment[:keep]))
+
+    def flush(self):
+        # Closes the segment in progress, e.g. when the recording stops
+        if self._segment:
+            self._close()
@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import requests
+from . import api_client
+from .disk_cache import CACHE_DIR
+
+VOICES_TTL = int(os.getenv('ELEVENGUI_VOICES_TTL', 3600))
+
+
+class VoiceCatalog:
+    # Voices indexed by name and by voice_id. The list is fetched once and
+    # kept in a snapshot on disk; a stale snapshot can still be used right
+    # away while refresh() revalidates it with If-None-Match.
+
+    def __init__(self, api_key, snapshot_path=os.path.join(CACHE_DIR, "voices.json"), ttl=VOICES_TTL):
+        self.api_key = api_key
+        self.snapshot_path = snapshot_path
+        self.ttl = ttl
+        self.voices = []
+        self.fetched_at = 0
+        self.etag = None
+        self._by_name = {}
+        self._by_id = {}
+        self._lock = threading.Lock()
+        self.load_snapshot()
+
+    def _set_voices(self, voices):
+        by_name = {}
+        by_id = {}
+        for voice in voices:
+            # The first voice wins when two share a name, as in the old linear scan
+            by_name.setdefault(voice["name"], voice)
+            by_id[voice["voice_id"]] = voice
+        with self._lock:
+            self.voices = voices
+            self._by_name = by_name
+            self._by_id = by_id
+
+    def load_snapshot(self):
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self._set_voices(snapshot["voices"])
+            self.fetched_at = snapshot.get("fetched_at", 0)
+            self.etag = snapshot.get("etag")
+            return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def _save_snapshot(self):
+        snapshot = {"fetched_at": self.fetched_at, "etag": self.etag, "voices": self.voices}
+        directory = os.path.dirname(self.snapshot_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(temp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"Unable to save the voice list: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def is_stale(self):
+        return not self.voices or time.time() - self.fetched_at > self.ttl
+
+    def refresh(self):
+        # Returns True if the voice list changed
+        headers = {"If-None-Match": self.etag} if self.etag and self.voices else None
+        try:
+            response = api_client.get("/v1/voices", api_key=self.api_key, headers=headers)
+        except requests.RequestException:
+            print("Unable to connect to ElevenLabs API. Please check your internet connection.")
+            return False
+        if response.status_code == 304:
+            self.fetched_at = time.time()
+            self._save_snapshot()
+            return False
+        if response.status_code != 200:
+            print("Error fetching voices")
+            return False
+        voices = response.json()["voices"]
+        changed = voices != self.voices
+        self._set_voices(voices)
+        self.fetched_at = time.time()
+        self.etag = response.headers.get("ETag")
+        self._save_snapshot()
+        return changed
+
+    def ensure_loaded(self):
+        # Only needed by callers that cannot wait for a background refresh
+        if self.is_stale():
+            self.refresh()
+
+    def names(self):
+        with self._lock:
+            return [voice["name"] for voice in self.voices]
+
+    def by_name(self, name):
+        with self._lock:
+            return self._by_name.get(name)
+
+    def by_id(self, voice_id):
+        with self._lock:
+            return self._by_id.get(voice_id)
+
+    def voice_id_for(self, name):
+        voice = self.by_name(name)
+        return voice["voice_id"] if voice else None
+
+    def preview_url_for(self, name):
+        voice = self.by_name(name)
+        return voice.get("preview_url") if voice else None
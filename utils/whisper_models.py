@@ -0,0 +1,100 @@
+import gc
+import os
+import threading
+import time
+from .lazy_import import lazy_import
+
+whisper = lazy_import('whisper')
+
+WHISPER_MODEL_SIZES = ["tiny.en", "base.en", "small.en", "medium.en", "large"]
+DEFAULT_WHISPER_MODEL = os.getenv('ELEVENGUI_WHISPER_MODEL', 'base.en')
+WHISPER_PRELOAD = os.getenv('ELEVENGUI_WHISPER_PRELOAD', '0') == '1'
+# Unload the weights after this many idle seconds (0 keeps them loaded)
+WHISPER_IDLE_UNLOAD_SECONDS = float(os.getenv('ELEVENGUI_WHISPER_IDLE_UNLOAD', 600))
+
+
+class WhisperModelManager:
+    # Keeps one local Whisper model warm between transcriptions instead of
+    # reloading the weights every time, and frees it after an idle period.
+
+    def __init__(self, model_name=DEFAULT_WHISPER_MODEL, idle_unload_seconds=WHISPER_IDLE_UNLOAD_SECONDS):
+        self.model_name = model_name
+        self.idle_unload_seconds = idle_unload_seconds
+        self.last_load_seconds = None
+        self.last_transcribe_seconds = None
+        self._model = None
+        self._loaded_name = None
+        self._last_used = time.monotonic()
+        self._unload_timer = None
+        # Held while loading or transcribing; a model is not shared between threads
+        self._lock = threading.RLock()
+
+    @property
+    def is_loaded(self):
+        return self._model is not None
+
+    def set_model_name(self, model_name):
+        # Called from the model menu on the Tk thread, so it never waits for
+        # the lock: get_model() sees the new name and swaps the model
+        if model_name == self.model_name:
+            return
+        self.model_name = model_name
+        if self._model is not None:
+            # Swap it on a worker right away so the next transcription does not pay for it
+            self.preload_async()
+
+    def get_model(self):
+        with self._lock:
+            if self._model is None or self._loaded_name != self.model_name:
+                self._release()
+                start = time.perf_counter()
+                self._model = whisper.load_model(self.model_name)
+                self._loaded_name = self.model_name
+                self.last_load_seconds = time.perf_counter() - start
+                print(f"Loaded Whisper model {self.model_name} in {self.last_load_seconds:.1f} s")
+            self._touch()
+            return self._model
+
+    def preload_async(self):
+        threading.Thread(target=self.get_model, daemon=True).start()
+
+    def transcribe(self, audio, **options):
+        with self._lock:
+            model = self.get_model()
+            start = time.perf_counter()
+            try:
+                return model.transcribe(audio, **options)
+            finally:
+                self.last_transcribe_seconds = time.perf_counter() - start
+                self._touch()
+
+    def timings(self):
+        return {"model": self.model_name, "load_seconds": self.last_load_seconds,
+                "transcribe_seconds": self.last_transcribe_seconds}
+
+    def _touch(self):
+        self._last_used = time.monotonic()
+        if self.idle_unload_seconds <= 0:
+            return
+        if self._unload_timer is not None:
+            self._unload_timer.cancel()
+        self._unload_timer = threading.Timer(self.idle_unload_seconds, self._unload_if_idle)
+        self._unload_timer.daemon = True
+        self._unload_timer.start()
+
+    def _unload_if_idle(self):
+        with self._lock:
+            # The model may have been used while this timer waited for the lock
+            if time.monotonic() - self._last_used >= self.idle_unload_seconds:
+                self.unload()
+
+    def unload(self):
+        with self._lock:
+            if self._model is not None:
+                print(f"Unloading idle Whisper model {self._loaded_name}")
+            self._release()
+
+    def _release(self):
+        self._model = None
+        self._loaded_name = None
+        gc.collect()